@@ -1,13 +1,44 @@
-from flask import Flask, request, render_template
+import os
+import threading
+from flask import Flask, request, render_template, jsonify
 import numpy as np
 import pandas as pd
 
-from src.pipeline.predict_pipeline import HousingData, PredictionPipeline
+from src.pipeline.predict_pipeline import HousingData, PredictionPipeline, ModelRouter
+from src.components.data_monitoring import DataMonitor
+from src.components.data_transformation import DataTransformationConfig
+from src.logger import logging
+from src.utils import load_object
 
 application = Flask(__name__)
 
 app = application
 
+# primary, candidate and shadow model versions are selected through environment variables
+router = ModelRouter.from_config()
+
+# build the attribution tables of every variant off the request path, failures are logged and the results page
+# then shows predictions without contributions
+def warm_explainers():
+    for name, artifact_set in router.variants.items():
+        try:
+            artifact_set.explainer
+        except Exception as e:
+            logging.warning(f"Explanations are unavailable for the {name} model: {e}")
+
+threading.Thread(target=warm_explainers, name="warm-explainers", daemon=True).start()
+
+# drift monitor shared by all requests, measured against the training data of the primary version and only
+# available once its reference statistics have been produced
+reference_stats_file_path = DataTransformationConfig(
+    artifacts_dir=router.variants["primary"].artifacts_dir
+).reference_stats_file_path
+monitor = None
+if os.path.exists(reference_stats_file_path):
+    monitor = DataMonitor(load_object(file_path=reference_stats_file_path))
+else:
+    logging.info(f"Reference statistics {reference_stats_file_path} not found, data monitoring disabled")
+
 # route for a home page
 
 @app.route('/california-housing')
@@ -34,10 +65,92 @@ def predict_datapoint():
         pred_df = data.get_data_as_data_frame()
         print(pred_df)
         
-        predict_pipeline = PredictionPipeline()
-        results = predict_pipeline.predict(pred_df)
+        predict_pipeline = PredictionPipeline(monitor=monitor, router=router)
+        # attributions are left empty when the model cannot be explained, the page then omits the contributions
+        result = predict_pipeline.predict_detailed(pred_df, explain=True, interval=True)
         print(data.households)
-        return render_template('result.html', results = results[0], data = data)
+        
+        contributions, base_value = [], None
+        if result.attributions is not None:
+            # largest contributions first
+            attribution = result.attributions.iloc[0]
+            base_value = attribution["base_value"]
+            attribution = attribution.drop("base_value")
+            contributions = list(attribution.reindex(attribution.abs().sort_values(ascending=False).index).items())
+        return render_template(
+            'result.html', results = result.predictions[0], data = data,
+            contributions = contributions, base_value = base_value,
+            interval = result.intervals[0] if result.intervals is not None else None
+        )
+
+NUMERICAL_FIELDS = [
+    'longitude',
+    'latitude',
+    'housing_median_age',
+    'total_rooms',
+    'total_bedrooms',
+    'population',
+    'households',
+    'median_income',
+]
+
+def parse_housing_record(record):
+    '''
+    Validates one JSON record and converts it like the form fields, raising ValueError on bad input
+    '''
+    if not isinstance(record, dict):
+        raise ValueError("every record must be a JSON object")
+    
+    missing = [field for field in NUMERICAL_FIELDS + ['ocean_proximity'] if field not in record]
+    unexpected = [field for field in record if field not in NUMERICAL_FIELDS + ['ocean_proximity']]
+    if missing or unexpected:
+        raise ValueError(f"missing fields {missing}, unexpected fields {unexpected}")
+    
+    values = {}
+    for field in NUMERICAL_FIELDS:
+        try:
+            values[field] = float(record[field])
+        except (TypeError, ValueError):
+            raise ValueError(f"{field} must be a number, got {record[field]!r}")
+    if not isinstance(record['ocean_proximity'], str):
+        raise ValueError("ocean_proximity must be a string")
+    
+    return HousingData(**values, ocean_proximity=record['ocean_proximity'])
+
+@app.route('/california-housing/explain', methods = ['POST'])
+def explain_datapoints():
+    records = request.get_json(silent=True)
+    if isinstance(records, dict):
+        records = [records]
+    if not isinstance(records, list) or not records:
+        return jsonify({"error": "expected a JSON record or a non-empty list of records"}), 400
+    
+    try:
+        housing_data = [parse_housing_record(record) for record in records]
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    pred_df = pd.concat([data.get_data_as_data_frame() for data in housing_data], ignore_index=True)
+    
+    predict_pipeline = PredictionPipeline(monitor=monitor, router=router)
+    result = predict_pipeline.predict_detailed(pred_df, explain=True, interval=True)
+    response = {
+        "predictions": np.asarray(result.predictions, dtype=float).tolist(),
+        "attributions": result.attributions.to_dict(orient="records") if result.attributions is not None else None,
+    }
+    if result.intervals is not None:
+        response["intervals"] = np.asarray(result.intervals, dtype=float).tolist()
+    return jsonify(response)
+
+@app.route('/california-housing/monitoring')
+def monitoring_report():
+    if monitor is None:
+        return jsonify({"error": "data monitoring is disabled"}), 404
+    return jsonify(monitor.drift_report())
+
+@app.route('/california-housing/variants')
+def variants_report():
+    return jsonify(router.metrics_report())
     
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,124 @@
+'''
+Compares the standard float64 data transformation with the compact float32 mode on the same train / test
+split, reporting the memory used by the transformed features, peak traced allocations, fit / predict
+times and the test score of a few representative models.
+
+Run from the root of the workspace, for example:
+
+    python benchmarks/compact_mode.py --scale 10 --output compact_mode.json
+'''
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+import pandas as pd
+
+sys.path.append(os.getcwd())
+
+from sklearn.ensemble import RandomForestRegressor # type: ignore
+from sklearn.linear_model import Ridge # type: ignore
+from sklearn.metrics import r2_score # type: ignore
+from xgboost import XGBRegressor # type: ignore
+
+from src.logger import logging
+from src.components.data_transformation import DataTransformation, DataTransformationConfig
+from src.utils import split_features_target
+
+
+def benchmark_models(seed):
+    return {
+        "Ridge Regressor": Ridge(alpha=1.0),
+        "Random Forest Regressor": RandomForestRegressor(n_estimators=50, max_depth=12, n_jobs=-1, random_state=seed),
+        "XGBRegressor": XGBRegressor(n_estimators=200, max_depth=7, learning_rate=0.1, random_state=seed),
+    }
+
+
+def traced(function, *args):
+    '''
+    Runs the function and returns its result, duration and peak traced Python / NumPy allocations in MiB
+    '''
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args)
+    duration = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, duration, peak / 2**20
+
+
+def run_mode(compact, train_path, test_path, seed):
+    with tempfile.TemporaryDirectory() as artifacts_dir:
+        data_transformation = DataTransformation(DataTransformationConfig(artifacts_dir=artifacts_dir, compact=compact))
+        (train_data, test_data, *_), transform_seconds, transform_peak_mb = traced(
+            data_transformation.initiate_data_transformation, train_path, test_path
+        )
+
+    X_train, y_train = split_features_target(train_data)
+    X_test, y_test = split_features_target(test_data)
+
+    report = {
+        "dtype": str(X_train.dtype),
+        "train_features_mb": X_train.nbytes / 2**20,
+        "transform_seconds": transform_seconds,
+        "transform_peak_mb": transform_peak_mb,
+        "models": {},
+    }
+
+    for name, model in benchmark_models(seed).items():
+        _, fit_seconds, fit_peak_mb = traced(model.fit, X_train, y_train)
+        start = time.perf_counter()
+        predicted = model.predict(X_test)
+        predict_seconds = time.perf_counter() - start
+
+        report["models"][name] = {
+            "test_score": r2_score(y_test, predicted),
+            "fit_seconds": fit_seconds,
+            "fit_peak_mb": fit_peak_mb,
+            "predict_seconds": predict_seconds,
+        }
+
+    return report
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare the standard and compact data transformation modes")
+    parser.add_argument("--train", default=os.path.join("artifacts", "train.csv"))
+    parser.add_argument("--test", default=os.path.join("artifacts", "test.csv"))
+    parser.add_argument("--scale", type=int, default=1, help="replicate the training rows this many times")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="write the report as JSON to this path")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        train_path = args.train
+        if args.scale > 1:
+            train_path = os.path.join(data_dir, "train.csv")
+            pd.concat([pd.read_csv(args.train)] * args.scale, ignore_index=True).to_csv(train_path, index=False)
+
+        report = {
+            "scale": args.scale,
+            "standard": run_mode(False, train_path, args.test, args.seed),
+            "compact": run_mode(True, train_path, args.test, args.seed),
+        }
+
+    standard, compact = report["standard"], report["compact"]
+    report["memory_saving"] = 1 - compact["train_features_mb"] / standard["train_features_mb"]
+    report["test_score_change"] = {
+        name: compact["models"][name]["test_score"] - standard["models"][name]["test_score"]
+        for name in standard["models"]
+    }
+
+    logging.info(f"Compact mode benchmark report: {report}")
+    print(json.dumps(report, indent=2))
+
+    if args.output is not None:
+        with open(args.output, "w") as file_obj:
+            json.dump(report, file_obj, indent=2)
@@ -0,0 +1,82 @@
+'''
+Measures the latency added by per-prediction attributions on the serving path, relative to point predictions
+alone, for several batch sizes, both for rows that are not cached yet and for repeated rows served from the
+prediction cache. Also reports the one-off time to build the explainer of the artifact set.
+
+Run from the root of the workspace, for example:
+
+    python benchmarks/explanations.py --batch-sizes 1 100 1000 --output explanations.json
+'''
+import os
+import sys
+import json
+import time
+import argparse
+
+import pandas as pd
+
+sys.path.append(os.getcwd())
+
+from src.logger import logging
+from src.pipeline.predict_pipeline import ArtifactSet
+from src.components.model_explainer import PredictionCache
+
+from benchmarks.prediction_intervals import median_latencies
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the latency of prediction attributions")
+    parser.add_argument("--artifacts-dir", default="artifacts")
+    parser.add_argument("--test", default=os.path.join("artifacts", "test.csv"))
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--repeats", type=int, default=100)
+    parser.add_argument("--output", default=None, help="write the report as JSON to this path")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    artifact_set = ArtifactSet(args.artifacts_dir)
+
+    start = time.perf_counter()
+    explainer = artifact_set.explainer
+    report = {
+        "model": type(artifact_set.model).__name__,
+        "method": explainer.method,
+        "explainer_build_ms": (time.perf_counter() - start) * 1000,
+        "batches": {},
+    }
+
+    test_df = pd.read_csv(args.test).drop(columns=["median_house_value"])
+
+    def explain_uncached(batch):
+        artifact_set.prediction_cache = PredictionCache()
+        return artifact_set.predict_detailed(batch, explain=True)
+
+    for batch_size in args.batch_sizes:
+        batch = test_df.sample(n=batch_size, replace=batch_size > len(test_df), random_state=0).reset_index(drop=True)
+
+        # warm up before measuring, the uncached path refills the cache right before the cached path runs
+        explain_uncached(batch)
+
+        base, uncached, cached = median_latencies([
+            lambda: artifact_set.predict_detailed(batch),
+            lambda: explain_uncached(batch),
+            lambda: artifact_set.predict_detailed(batch, explain=True),
+        ], args.repeats)
+
+        report["batches"][batch_size] = {
+            "base_ms": float(base) * 1000,
+            "uncached_ms": float(uncached) * 1000,
+            "cached_ms": float(cached) * 1000,
+            "uncached_overhead": float((uncached - base) / base),
+            "cached_overhead": float((cached - base) / base),
+        }
+
+    logging.info(f"Explanation benchmark report: {report}")
+    print(json.dumps(report, indent=2))
+
+    if args.output is not None:
+        with open(args.output, "w") as file_obj:
+            json.dump(report, file_obj, indent=2)
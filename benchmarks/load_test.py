@@ -0,0 +1,327 @@
+'''
+Replays recorded prediction requests (or synthetic ones sampled from the housing dataset)
+against a local instance of application.py and reports throughput, latency percentiles,
+error rates and server-side CPU / RSS usage.
+
+Run from the root of the workspace, for example:
+
+    python benchmarks/load_test.py --mode closed --concurrency 8 --duration 30
+    python benchmarks/load_test.py --mode open --rate 50 --duration 30 --output load_test.json
+'''
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+import subprocess
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import psutil # type: ignore
+
+sys.path.append(os.getcwd())
+
+from src.logger import logging
+
+
+FORM_FIELDS = [
+    "longitude",
+    "latitude",
+    "housing_median_age",
+    "total_rooms",
+    "total_bedrooms",
+    "population",
+    "households",
+    "median_income",
+    "ocean_proximity",
+]
+
+
+@dataclass
+class LoadTestConfig:
+    REQUESTS_FILE_PATH = "requests.jsonl"
+    HOUSING_DATA_PATH = os.path.join("notebooks", "data", "housing.csv")
+    PREDICT_ROUTE = "/california-housing/predict"
+    HOST = "127.0.0.1"
+    PORT = 5050
+    SERVER_START_TIMEOUT = 60.0
+    RESOURCE_SAMPLE_INTERVAL = 0.5
+    REQUEST_TIMEOUT = 30.0
+
+
+def load_recorded_requests(file_path):
+    '''
+    Reads prediction form payloads from a JSON lines file, either as flat records or nested under a "form" key.
+    Lines that do not carry every form field are skipped.
+    '''
+    payloads = []
+    skipped = 0
+
+    if not os.path.exists(file_path):
+        return payloads
+
+    with open(file_path) as file_obj:
+        for line in file_obj:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                skipped += 1
+                continue
+
+            form = record.get("form", record) if isinstance(record, dict) else None
+            if not isinstance(form, dict) or not all(field in form for field in FORM_FIELDS):
+                skipped += 1
+                continue
+
+            payloads.append({field: str(form[field]) for field in FORM_FIELDS})
+
+    logging.info(f"Loaded {len(payloads)} recorded requests from {file_path}, skipped {skipped} lines")
+    return payloads
+
+
+def synthesize_requests(file_path, num_requests, seed):
+    '''
+    Samples complete rows of the housing dataset as prediction form payloads
+    '''
+    df = pd.read_csv(file_path, usecols=FORM_FIELDS).dropna()
+    sample = df.sample(n=num_requests, replace=num_requests > len(df), random_state=seed)
+    return [{field: str(value) for field, value in row.items()} for row in sample.to_dict(orient="records")]
+
+
+def send_request(url, payload, timeout):
+    data = urllib.parse.urlencode(payload).encode()
+    try:
+        with urllib.request.urlopen(url, data=data, timeout=timeout) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except Exception:
+        return None
+
+
+class ServerProcess:
+    '''
+    Starts application.py through the flask CLI without the reloader so that the measured process serves the requests
+    '''
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.process = None
+
+    def start(self, timeout):
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "flask", "--app", "application", "run",
+             "--host", self.host, "--port", str(self.port), "--no-reload"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError("Flask application exited during start up")
+            try:
+                with socket.create_connection((self.host, self.port), timeout=1):
+                    return self.process.pid
+            except OSError:
+                time.sleep(0.2)
+
+        self.stop()
+        raise RuntimeError(f"Flask application did not start within {timeout} seconds")
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            self.process.wait(timeout=10)
+
+
+class ResourceSampler(threading.Thread):
+    '''
+    Periodically samples CPU utilisation and resident memory of the server process
+    '''
+    def __init__(self, pid, interval):
+        super().__init__(daemon=True)
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self.cpu_percent = []
+        self.rss_bytes = []
+        self._stop_event = threading.Event()
+
+    def run(self):
+        self.process.cpu_percent(None)
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.cpu_percent.append(self.process.cpu_percent(None))
+                self.rss_bytes.append(self.process.memory_info().rss)
+            except psutil.Error:
+                break
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def run_closed_loop(url, payloads, concurrency, duration, timeout):
+    '''
+    Each worker sends its next request as soon as the previous one has completed
+    '''
+    results = []
+    results_lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker(worker_id):
+        index = worker_id
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            status = send_request(url, payloads[index % len(payloads)], timeout)
+            latency = time.perf_counter() - start
+            with results_lock:
+                results.append((latency, status))
+            index += concurrency
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return results
+
+
+def run_open_loop(url, payloads, rate, duration, max_workers, timeout):
+    '''
+    Issues requests on a fixed schedule regardless of completions. Latency is measured from the
+    scheduled send time so that queueing delay in the client is not hidden.
+    '''
+    results = []
+    results_lock = threading.Lock()
+
+    def issue(payload, scheduled):
+        status = send_request(url, payload, timeout)
+        latency = time.perf_counter() - scheduled
+        with results_lock:
+            results.append((latency, status))
+
+    num_requests = int(rate * duration)
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for i in range(num_requests):
+            scheduled = start + i / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(issue, payloads[i % len(payloads)], scheduled)
+
+    return results
+
+
+def summarize(results, elapsed, sampler):
+    latencies = np.array([latency for latency, _ in results]) * 1000
+    errors = sum(1 for _, status in results if status != 200)
+
+    report = {
+        "requests": len(results),
+        "elapsed_seconds": elapsed,
+        "throughput_rps": len(results) / elapsed if elapsed > 0 else 0.0,
+        "error_rate": errors / len(results) if results else 0.0,
+        "latency_ms": {},
+        "server": {},
+    }
+
+    if len(latencies):
+        report["latency_ms"] = {
+            "mean": float(latencies.mean()),
+            "p50": float(np.percentile(latencies, 50)),
+            "p90": float(np.percentile(latencies, 90)),
+            "p99": float(np.percentile(latencies, 99)),
+            "max": float(latencies.max()),
+        }
+
+    if sampler is not None and sampler.cpu_percent:
+        report["server"] = {
+            "cpu_percent_mean": float(np.mean(sampler.cpu_percent)),
+            "cpu_percent_max": float(np.max(sampler.cpu_percent)),
+            "rss_mb_mean": float(np.mean(sampler.rss_bytes)) / 2**20,
+            "rss_mb_max": float(np.max(sampler.rss_bytes)) / 2**20,
+        }
+
+    return report
+
+
+def parse_args():
+    config = LoadTestConfig()
+    parser = argparse.ArgumentParser(description="Load test the California housing prediction application")
+    parser.add_argument("--mode", choices=["open", "closed"], default="closed")
+    parser.add_argument("--rate", type=float, default=20.0, help="requests per second in open-loop mode")
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent clients in closed-loop mode")
+    parser.add_argument("--max-workers", type=int, default=64, help="client threads in open-loop mode")
+    parser.add_argument("--duration", type=float, default=30.0, help="test duration in seconds")
+    parser.add_argument("--requests-file", default=config.REQUESTS_FILE_PATH)
+    parser.add_argument("--synthetic", type=int, default=1000, help="synthetic requests to generate when none are recorded")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--host", default=config.HOST)
+    parser.add_argument("--port", type=int, default=config.PORT)
+    parser.add_argument("--url", default=None, help="target an already running instance instead of starting one")
+    parser.add_argument("--server-pid", type=int, default=None, help="pid of the already running instance for resource sampling")
+    parser.add_argument("--output", default=None, help="write the report as JSON to this path")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    config = LoadTestConfig()
+
+    payloads = load_recorded_requests(args.requests_file)
+    if not payloads:
+        payloads = synthesize_requests(config.HOUSING_DATA_PATH, args.synthetic, args.seed)
+        logging.info(f"Generated {len(payloads)} synthetic requests from {config.HOUSING_DATA_PATH}")
+
+    server = None
+    server_pid = args.server_pid
+    url = args.url
+    if url is None:
+        server = ServerProcess(args.host, args.port)
+        server_pid = server.start(config.SERVER_START_TIMEOUT)
+        url = f"http://{args.host}:{args.port}{config.PREDICT_ROUTE}"
+
+    sampler = None
+    if server_pid is not None:
+        sampler = ResourceSampler(server_pid, config.RESOURCE_SAMPLE_INTERVAL)
+        sampler.start()
+
+    try:
+        # warm up the application before measuring
+        send_request(url, payloads[0], config.REQUEST_TIMEOUT)
+
+        start = time.perf_counter()
+        if args.mode == "closed":
+            results = run_closed_loop(url, payloads, args.concurrency, args.duration, config.REQUEST_TIMEOUT)
+        else:
+            results = run_open_loop(url, payloads, args.rate, args.duration, args.max_workers, config.REQUEST_TIMEOUT)
+        elapsed = time.perf_counter() - start
+    finally:
+        if sampler is not None:
+            sampler.stop()
+        if server is not None:
+            server.stop()
+
+    report = summarize(results, elapsed, sampler)
+    report["mode"] = args.mode
+    logging.info(f"Load test report: {report}")
+    print(json.dumps(report, indent=2))
+
+    if args.output is not None:
+        with open(args.output, "w") as file_obj:
+            json.dump(report, file_obj, indent=2)
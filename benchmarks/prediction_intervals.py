@@ -0,0 +1,97 @@
+'''
+Measures the latency added by prediction intervals on the serving path, relative to point predictions alone,
+for several batch sizes, and reports the interval coverage and width on the test data. Exits with a non-zero
+status when the added latency of any batch size exceeds --max-overhead (default 25%) of the base latency.
+
+Train with PREDICTION_INTERVAL_COVERAGE set first, then run from the root of the workspace, for example:
+
+    python benchmarks/prediction_intervals.py --batch-sizes 1 100 --max-overhead 0.25
+'''
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.getcwd())
+
+from src.logger import logging
+from src.pipeline.predict_pipeline import ArtifactSet
+
+
+def median_latencies(functions, repeats):
+    '''
+    Times the functions in turn on every repeat so that drift in machine load affects all of them alike
+    '''
+    latencies = np.zeros((repeats, len(functions)))
+    for i in range(repeats):
+        for j, function in enumerate(functions):
+            start = time.perf_counter()
+            function()
+            latencies[i, j] = time.perf_counter() - start
+    return np.median(latencies, axis=0)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the latency of prediction intervals")
+    parser.add_argument("--artifacts-dir", default="artifacts")
+    parser.add_argument("--test", default=os.path.join("artifacts", "test.csv"))
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--max-overhead", type=float, default=0.25, help="allowed added latency as a fraction of the base latency")
+    parser.add_argument("--output", default=None, help="write the report as JSON to this path")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    artifact_set = ArtifactSet(args.artifacts_dir)
+    if artifact_set.interval_model is None:
+        sys.exit("No interval model found, train with PREDICTION_INTERVAL_COVERAGE set")
+
+    test_df = pd.read_csv(args.test)
+    y_test = test_df.pop("median_house_value").to_numpy()
+
+    intervals = artifact_set.predict_detailed(test_df, interval=True).intervals
+    report = {
+        "nominal_coverage": artifact_set.interval_model.coverage,
+        "test_coverage": float(np.mean((intervals[:, 0] <= y_test) & (y_test <= intervals[:, 1]))),
+        "mean_width": float(np.mean(intervals[:, 1] - intervals[:, 0])),
+        "max_overhead": args.max_overhead,
+        "batches": {},
+    }
+
+    for batch_size in args.batch_sizes:
+        batch = test_df.sample(n=batch_size, replace=batch_size > len(test_df), random_state=0).reset_index(drop=True)
+
+        # warm up both paths before measuring
+        artifact_set.predict_detailed(batch, interval=True)
+
+        base, with_interval = median_latencies([
+            lambda: artifact_set.predict_detailed(batch),
+            lambda: artifact_set.predict_detailed(batch, interval=True),
+        ], args.repeats)
+
+        overhead = float((with_interval - base) / base)
+        report["batches"][batch_size] = {
+            "base_ms": float(base) * 1000,
+            "with_interval_ms": float(with_interval) * 1000,
+            "overhead": overhead,
+            "passed": overhead <= args.max_overhead,
+        }
+
+    report["passed"] = all(batch["passed"] for batch in report["batches"].values())
+
+    logging.info(f"Prediction interval benchmark report: {report}")
+    print(json.dumps(report, indent=2))
+
+    if args.output is not None:
+        with open(args.output, "w") as file_obj:
+            json.dump(report, file_obj, indent=2)
+
+    if not report["passed"]:
+        sys.exit(1)
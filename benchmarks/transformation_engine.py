@@ -0,0 +1,96 @@
+'''
+Compares the per-stage timings of the scikit-learn and shared statistics data transformation engines on
+the same train / test split, and reports the total fit time of each engine. Exits with a non-zero status when
+the transformed features of the two engines differ by more than the tolerance of the feature dtype.
+
+Run from the root of the workspace, for example:
+
+    python benchmarks/transformation_engine.py --scale 20 --n-jobs 8 --output transformation_engine.json
+'''
+import os
+import sys
+import json
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.getcwd())
+
+from src.logger import logging
+from src.components.data_transformation import DataTransformation, DataTransformationConfig
+from src.utils import split_features_target
+
+# largest absolute difference allowed between the engines, they only differ in floating point summation order
+TOLERANCES = {"float64": 1e-8, "float32": 1e-4}
+
+
+def run_engine(engine, train_path, test_path, compact, n_jobs, repeats):
+    '''
+    Returns the median duration of every stage over the repeats, in seconds, and the transformed train and
+    test features
+    '''
+    runs = []
+    for _ in range(repeats):
+        with tempfile.TemporaryDirectory() as artifacts_dir:
+            data_transformation = DataTransformation(DataTransformationConfig(
+                artifacts_dir=artifacts_dir, compact=compact, engine=engine, n_jobs=n_jobs
+            ))
+            train_data, test_data, *_ = data_transformation.initiate_data_transformation(train_path, test_path)
+            runs.append(data_transformation.stage_timings)
+
+    stages = {stage: float(np.median([run[stage] for run in runs])) for stage in runs[0]}
+    features = [split_features_target(train_data)[0], split_features_target(test_data)[0]]
+    return {"stages": stages, "total_seconds": sum(stages.values())}, features
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare the data transformation engines stage by stage")
+    parser.add_argument("--train", default=os.path.join("artifacts", "train.csv"))
+    parser.add_argument("--test", default=os.path.join("artifacts", "test.csv"))
+    parser.add_argument("--scale", type=int, default=1, help="replicate the training rows this many times")
+    parser.add_argument("--compact", action="store_true")
+    parser.add_argument("--n-jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default=None, help="write the report as JSON to this path")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        train_path = args.train
+        if args.scale > 1:
+            train_path = os.path.join(data_dir, "train.csv")
+            pd.concat([pd.read_csv(args.train)] * args.scale, ignore_index=True).to_csv(train_path, index=False)
+
+        report = {"scale": args.scale, "compact": args.compact, "n_jobs": args.n_jobs, "engines": {}}
+        features = {}
+        for engine in ["sklearn", "shared_stats"]:
+            report["engines"][engine], features[engine] = run_engine(
+                engine, train_path, args.test, args.compact, args.n_jobs, args.repeats
+            )
+
+    engines = report["engines"]
+    report["speedup"] = engines["sklearn"]["total_seconds"] / engines["shared_stats"]["total_seconds"]
+
+    dtype = str(features["sklearn"][0].dtype)
+    report["max_abs_difference"] = max(
+        float(np.max(np.abs(expected - actual))) if expected.shape == actual.shape else float("inf")
+        for expected, actual in zip(features["sklearn"], features["shared_stats"])
+    )
+    report["passed"] = (
+        dtype == str(features["shared_stats"][0].dtype) and report["max_abs_difference"] <= TOLERANCES[dtype]
+    )
+
+    logging.info(f"Transformation engine benchmark report: {report}")
+    print(json.dumps(report, indent=2))
+
+    if args.output is not None:
+        with open(args.output, "w") as file_obj:
+            json.dump(report, file_obj, indent=2)
+
+    if not report["passed"]:
+        sys.exit(1)
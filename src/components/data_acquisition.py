@@ -0,0 +1,262 @@
+import io
+import os
+import sys
+import shutil
+import hashlib
+import tempfile
+import subprocess
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from src.exception import CustomException
+from src.logger import logging
+
+from src.utils import write_json, read_json
+
+
+@dataclass
+class KaggleConfig:
+    DATASET = os.getenv("KAGGLE_DATASET")
+    DATA_PATH = './notebooks/data'
+
+class KaggleCaliforniaHousingDataset:
+    def __init__(self):
+        self.kaggle_config = KaggleConfig()
+
+    # download Kaggle dataset into the given directory
+    def download_kaggle_dataset(self, download_dir=None):
+        download_dir = download_dir or self.kaggle_config.DATA_PATH
+        try:
+            if self.kaggle_config.DATASET is None:
+                raise ValueError("KAGGLE_DATASET environment variable is not set")
+            subprocess.run(['kaggle', 'datasets', 'download', '-d', self.kaggle_config.DATASET, '-p', download_dir, '--unzip'], check=True)
+            logging.info("Downloaded Data from Kaggle successfully")
+        except Exception as e:
+            raise CustomException(e, sys)
+
+
+@dataclass
+class DatasetAcquisitionConfig:
+    DATA_PATH = os.path.join('notebooks', 'data')
+    FILE_NAME = "housing.csv"
+    MANIFEST_FILE_NAME = "housing.manifest.json"
+    CACHE_FILE_NAME = "housing.typed.pkl"
+    # run-local state of the typed cache, kept out of the tracked manifest
+    CACHE_STATE_FILE_NAME = "housing.typed.json"
+    # local directory or file:// URL holding a copy of housing.csv, used before falling back to Kaggle
+    MIRROR = os.getenv("DATASET_MIRROR")
+    # files larger than one chunk are parsed in parallel
+    CHUNK_SIZE_BYTES = 8 * 2**20
+    N_JOBS = os.cpu_count() or 1
+    HASH_BLOCK_SIZE = 2**20
+    SCHEMA = {
+        "longitude": "float64",
+        "latitude": "float64",
+        "housing_median_age": "float64",
+        "total_rooms": "float64",
+        "total_bedrooms": "float64",
+        "population": "float64",
+        "households": "float64",
+        "median_income": "float64",
+        "median_house_value": "float64",
+        "ocean_proximity": "category",
+    }
+
+class DatasetAcquisition:
+    '''
+    Fetches the housing dataset, verifies it against a checksum and schema manifest and keeps a typed cache
+    so that repeated runs do not parse the CSV again
+    '''
+    def __init__(self):
+        self.acquisition_config = DatasetAcquisitionConfig()
+        self.csv_path = os.path.join(self.acquisition_config.DATA_PATH, self.acquisition_config.FILE_NAME)
+        self.manifest_path = os.path.join(self.acquisition_config.DATA_PATH, self.acquisition_config.MANIFEST_FILE_NAME)
+        self.cache_path = os.path.join(self.acquisition_config.DATA_PATH, self.acquisition_config.CACHE_FILE_NAME)
+        self.cache_state_path = os.path.join(self.acquisition_config.DATA_PATH, self.acquisition_config.CACHE_STATE_FILE_NAME)
+
+    def load_dataset(self):
+        try:
+            os.makedirs(self.acquisition_config.DATA_PATH, exist_ok=True)
+            manifest = self.read_manifest()
+
+            checksum = None
+            if os.path.exists(self.csv_path):
+                checksum = file_checksum(self.csv_path, self.acquisition_config.HASH_BLOCK_SIZE)
+                if manifest is not None and checksum != manifest["sha256"]:
+                    logging.info("Cached dataset does not match its manifest checksum, fetching it again")
+                    checksum = None
+
+            if checksum is None:
+                self.fetch_dataset()
+                checksum = file_checksum(self.csv_path, self.acquisition_config.HASH_BLOCK_SIZE)
+                if manifest is not None and checksum != manifest["sha256"]:
+                    raise ValueError(f"Fetched dataset checksum {checksum} does not match manifest {manifest['sha256']}")
+
+            df = self.read_cache(manifest, checksum)
+            if df is not None:
+                return df
+
+            df = self.parse_csv(self.csv_path)
+
+            if manifest is None:
+                manifest = self.build_manifest(df, checksum)
+                write_json(self.manifest_path, manifest)
+                logging.info(f"Recorded dataset manifest {self.manifest_path}")
+            self.verify_schema(df, manifest)
+
+            self.write_cache(df, checksum)
+            logging.info(f"Wrote typed dataset cache {self.cache_path}")
+
+            return df
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def read_cache(self, manifest, checksum):
+        '''
+        Returns the typed cache when it was built from the exact source file, None when it is missing, stale or
+        cannot be loaded
+        '''
+        if manifest is None or not os.path.exists(self.cache_path) or not os.path.exists(self.cache_state_path):
+            return None
+
+        try:
+            if read_json(self.cache_state_path)["source_sha256"] != checksum:
+                return None
+            df = pd.read_pickle(self.cache_path)
+            self.verify_schema(df, manifest)
+        except Exception as e:
+            logging.info(f"Typed dataset cache {self.cache_path} could not be used, parsing the CSV again: {e}")
+            return None
+
+        logging.info(f"Loaded typed dataset cache {self.cache_path}")
+        return df
+
+    def write_cache(self, df, checksum):
+        # the state is only written once the cache is complete, so an interrupted write is never trusted
+        if os.path.exists(self.cache_state_path):
+            os.remove(self.cache_state_path)
+
+        tmp_path = f"{self.cache_path}.tmp"
+        df.to_pickle(tmp_path)
+        os.replace(tmp_path, self.cache_path)
+
+        write_json(self.cache_state_path, {
+            "source_sha256": checksum,
+            "created": datetime.now(timezone.utc).isoformat(),
+        })
+
+    def fetch_dataset(self):
+        '''
+        Copies the dataset from the configured mirror, or downloads it from Kaggle, through a temporary
+        file so that an interrupted fetch never leaves a partial housing.csv behind
+        '''
+        mirror = self.acquisition_config.MIRROR
+
+        with tempfile.TemporaryDirectory(dir=self.acquisition_config.DATA_PATH) as tmp_dir:
+            tmp_path = os.path.join(tmp_dir, self.acquisition_config.FILE_NAME)
+
+            if mirror is None:
+                KaggleCaliforniaHousingDataset().download_kaggle_dataset(tmp_dir)
+                source = "kaggle"
+            elif mirror.startswith("file://"):
+                source = urllib.parse.urljoin(mirror.rstrip("/") + "/", self.acquisition_config.FILE_NAME)
+                with urllib.request.urlopen(source) as response, open(tmp_path, "wb") as file_obj:
+                    shutil.copyfileobj(response, file_obj)
+            else:
+                source = os.path.join(mirror, self.acquisition_config.FILE_NAME)
+                shutil.copyfile(source, tmp_path)
+
+            os.replace(tmp_path, self.csv_path)
+
+        logging.info(f"Fetched dataset from {source}")
+
+    def parse_csv(self, file_path):
+        '''
+        Parses the CSV with explicit dtypes, splitting files larger than one chunk into newline aligned
+        byte ranges parsed on a thread pool
+        '''
+        schema = self.acquisition_config.SCHEMA
+        # categories are only known after every chunk is parsed
+        parse_dtypes = {column: ("object" if dtype == "category" else dtype) for column, dtype in schema.items()}
+
+        with open(file_path, "rb") as file_obj:
+            header = file_obj.readline()
+            columns = header.decode().strip().split(",")
+            if sorted(columns) != sorted(schema):
+                raise ValueError(f"Unexpected dataset columns {columns}")
+
+            ranges = chunk_ranges(file_obj, len(header), os.path.getsize(file_path), self.acquisition_config.CHUNK_SIZE_BYTES)
+
+        def parse_range(byte_range):
+            start, end = byte_range
+            with open(file_path, "rb") as file_obj:
+                file_obj.seek(start)
+                data = file_obj.read(end - start)
+            return pd.read_csv(io.BytesIO(data), header=None, names=columns, dtype=parse_dtypes)
+
+        if len(ranges) > 1:
+            with ThreadPoolExecutor(max_workers=self.acquisition_config.N_JOBS) as executor:
+                chunks = list(executor.map(parse_range, ranges))
+            df = pd.concat(chunks, ignore_index=True)
+        else:
+            df = parse_range(ranges[0])
+
+        for column, dtype in schema.items():
+            if dtype == "category":
+                df[column] = df[column].astype("category")
+
+        logging.info(f"Parsed {len(df)} rows from {file_path} in {len(ranges)} chunks")
+        return df
+
+    def build_manifest(self, df, checksum):
+        return {
+            "file": self.acquisition_config.FILE_NAME,
+            "sha256": checksum,
+            "size_bytes": os.path.getsize(self.csv_path),
+            "rows": len(df),
+            "columns": {column: str(dtype) for column, dtype in df.dtypes.items()},
+        }
+
+    def verify_schema(self, df, manifest):
+        columns = {column: str(dtype) for column, dtype in df.dtypes.items()}
+        if columns != manifest["columns"]:
+            raise ValueError(f"Dataset columns {columns} do not match manifest {manifest['columns']}")
+        if len(df) != manifest["rows"]:
+            raise ValueError(f"Dataset has {len(df)} rows, manifest expects {manifest['rows']}")
+
+    def read_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return None
+        return read_json(self.manifest_path)
+
+
+def file_checksum(file_path, block_size):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file_obj:
+        for block in iter(lambda: file_obj.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def chunk_ranges(file_obj, data_start, file_size, chunk_size):
+    '''
+    Splits the data section of an open file into byte ranges of roughly chunk_size that end on a newline
+    '''
+    boundaries = [data_start]
+    for target in np.arange(data_start + chunk_size, file_size, chunk_size):
+        if target <= boundaries[-1]:
+            continue
+        file_obj.seek(int(target))
+        file_obj.readline()
+        position = file_obj.tell()
+        if position >= file_size:
+            break
+        boundaries.append(position)
+    boundaries.append(file_size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
@@ -4,12 +4,10 @@ from src.logger import logging
 from src.exception import CustomException
 from src.components.data_transformation import DataTransformationConfig, DataTransformation
 from src.components.model_trainer import ModelTrainer
+from src.components.data_acquisition import DatasetAcquisition
 
-import subprocess
 from pymongo import MongoClient # type: ignore
 
-import pandas as pd
-
 from sklearn.model_selection import train_test_split # type: ignore
 from dataclasses import dataclass
 
@@ -26,12 +24,8 @@ class DataIngestion:
     def initiate_data_ingestion(self):
         logging.info("Data Ingestion initiated")
         try:
-            # Download dataset from kaggle if required
-            data = KaggleCaliforniaHousingDataset()
-            data.download_kaggle_dataset()
-            
-            # load data in a dataframe
-            df = pd.read_csv('./notebooks/data/housing.csv')
+            # fetch the dataset if required and load it from the verified typed cache
+            df = DatasetAcquisition().load_dataset()
             
             # ! debug data upload in MonogoDB
             # # establish connection with database
@@ -131,26 +125,6 @@ class DatabaseConnection:
         except Exception as e:
             raise CustomException(e, sys)
 
-@dataclass
-class KaggleConfig:
-    DATASET = os.getenv("KAGGLE_DATASET")
-    DATA_PATH = './notebooks/data'
-
-class KaggleCaliforniaHousingDataset:
-    def __init__(self):
-        self.kaggle_config = KaggleConfig()
-    
-    # download Kaggle dataset
-    def download_kaggle_dataset(self):
-        try:
-            if not os.path.exists(os.path.join(self.kaggle_config.DATA_PATH, "housing.csv")):
-                subprocess.run(['kaggle', 'datasets', 'download', '-d', self.kaggle_config.dataset, '-p', self.kaggle_config.dataset, '--unzip'], check=True)
-                logging.info("Downloaded Data from Kaggle successfully")
-            else:
-                logging.info("Data already downloaded")
-        except subprocess.CalledProcessError as e:
-            print(f"Error occurred while downloading the dataset: {e}")
-            
 if __name__ == "__main__":
     ingestion = DataIngestion()
     train_df, test_df = ingestion.initiate_data_ingestion()
@@ -0,0 +1,258 @@
+import os
+import sys
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from src.exception import CustomException
+from src.logger import logging
+
+
+@dataclass
+class DataMonitoringConfig:
+    NUM_BINS = 10
+    # drift is reported over roughly the most recent WINDOW_OBSERVATIONS inputs, kept as NUM_WINDOWS rotating
+    # count buffers so that old traffic is dropped a buffer at a time
+    WINDOW_OBSERVATIONS = int(os.getenv("MONITORING_WINDOW_OBSERVATIONS", "10000"))
+    NUM_WINDOWS = 4
+    # proportion floor so that empty bins do not blow up the PSI logarithm
+    EPSILON = 1e-4
+
+
+def population_stability_index(expected, actual, epsilon=DataMonitoringConfig.EPSILON):
+    '''
+    Population Stability Index between two binned distributions given as proportions
+    '''
+    expected = np.clip(np.asarray(expected, dtype=float), epsilon, None)
+    actual = np.clip(np.asarray(actual, dtype=float), epsilon, None)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def ks_statistic(expected, actual):
+    '''
+    Kolmogorov-Smirnov distance between two binned distributions given as proportions
+    '''
+    return float(np.max(np.abs(np.cumsum(expected) - np.cumsum(actual))))
+
+
+class RotatingCounts:
+    '''
+    Bin counts kept in a ring of buffers, the current buffer receives updates and rotating clears the oldest one
+    '''
+    def __init__(self, num_bins, num_windows):
+        self.window_counts = np.zeros((num_windows, num_bins), dtype=np.int64)
+        self.window_missing = np.zeros(num_windows, dtype=np.int64)
+        self.current = 0
+
+    @property
+    def counts(self):
+        return self.window_counts.sum(axis=0)
+
+    @property
+    def missing(self):
+        return int(self.window_missing.sum())
+
+    def add(self, bin_counts, missing):
+        self.window_counts[self.current] += bin_counts
+        self.window_missing[self.current] += missing
+
+    def rotate(self):
+        self.current = (self.current + 1) % len(self.window_counts)
+        self.window_counts[self.current] = 0
+        self.window_missing[self.current] = 0
+
+    def reset(self):
+        self.window_counts[:] = 0
+        self.window_missing[:] = 0
+
+
+class StreamingHistogram(RotatingCounts):
+    '''
+    Fixed-memory histogram of a numerical feature over bin edges taken from the reference data
+    '''
+    def __init__(self, edges, reference_proportions, num_windows=DataMonitoringConfig.NUM_WINDOWS):
+        self.edges = np.asarray(edges, dtype=float)
+        self.reference_proportions = np.asarray(reference_proportions, dtype=float)
+        super().__init__(len(self.reference_proportions), num_windows)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float).ravel()
+        missing_mask = np.isnan(values)
+        bins = np.searchsorted(self.edges, values[~missing_mask], side="right")
+        self.add(np.bincount(bins, minlength=len(self.reference_proportions)), int(missing_mask.sum()))
+
+
+class StreamingCategoryCounter(RotatingCounts):
+    '''
+    Fixed-memory counter of a categorical feature, unseen categories share a single "other" bucket
+    '''
+    def __init__(self, categories, reference_proportions, num_windows=DataMonitoringConfig.NUM_WINDOWS):
+        self.categories = list(categories)
+        # first bucket holds categories that were not seen in the reference data
+        self.reference_proportions = np.concatenate([[0.0], np.asarray(reference_proportions, dtype=float)])
+        self.category_bins = {category: i + 1 for i, category in enumerate(self.categories)}
+        super().__init__(len(self.reference_proportions), num_windows)
+
+    def update(self, values):
+        # requests hold a handful of rows, a dictionary lookup per value is far cheaper than building pandas objects
+        bins = []
+        missing = 0
+        for value in np.asarray(values, dtype=object).ravel():
+            if value is None or (isinstance(value, float) and np.isnan(value)):
+                missing += 1
+            else:
+                bins.append(self.category_bins.get(value, 0))
+        self.add(np.bincount(np.asarray(bins, dtype=np.int64), minlength=len(self.reference_proportions)), missing)
+
+
+class DataMonitor:
+    '''
+    Tracks recent input features and predictions against the reference statistics captured
+    during data transformation and reports PSI / KS drift scores
+    '''
+    def __init__(self, reference_stats, window_observations=DataMonitoringConfig.WINDOW_OBSERVATIONS):
+        try:
+            self.monitoring_config = DataMonitoringConfig()
+            # observations after which the oldest count buffer is dropped
+            self.rotation_observations = max(1, window_observations // self.monitoring_config.NUM_WINDOWS)
+
+            self.numerical_sketches = {
+                name: StreamingHistogram(stats["edges"], stats["proportions"])
+                for name, stats in reference_stats["numerical"].items()
+            }
+            self.categorical_sketches = {
+                name: StreamingCategoryCounter(stats["categories"], stats["proportions"])
+                for name, stats in reference_stats["categorical"].items()
+            }
+            self.prediction_sketch = StreamingHistogram(
+                reference_stats["prediction"]["edges"], reference_stats["prediction"]["proportions"]
+            )
+            self.observations = 0
+            self._current_window_observations = 0
+
+            # flask serves requests on several threads
+            self._lock = threading.Lock()
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    @staticmethod
+    def build_reference_statistics(X, y, numerical_features, categorical_features, num_bins=DataMonitoringConfig.NUM_BINS):
+        '''
+        Summarises the training features and target into bin edges and proportions used as the drift reference
+        '''
+        try:
+            reference_stats = {"numerical": {}, "categorical": {}}
+
+            for column in numerical_features:
+                reference_stats["numerical"][column] = DataMonitor._histogram_reference(X[column], num_bins)
+
+            for column in categorical_features:
+                proportions = X[column].dropna().value_counts(normalize=True).sort_index()
+                reference_stats["categorical"][column] = {
+                    "categories": proportions.index.tolist(),
+                    "proportions": proportions.to_numpy(),
+                }
+
+            # placeholder until ModelTrainer replaces it with the distribution of the trained model's predictions
+            reference_stats["prediction"] = DataMonitor._histogram_reference(y, num_bins)
+
+            return reference_stats
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    @staticmethod
+    def build_prediction_reference(predictions, num_bins=DataMonitoringConfig.NUM_BINS):
+        '''
+        Summarises the trained model's predictions on the training features, regression predictions are narrower
+        than the target so live predictions are compared against them instead
+        '''
+        return DataMonitor._histogram_reference(predictions, num_bins)
+
+    @staticmethod
+    def _histogram_reference(values, num_bins):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+
+        # quantile edges give roughly equally populated reference bins
+        edges = np.unique(np.quantile(values, np.linspace(0, 1, num_bins + 1)[1:-1]))
+        bins = np.searchsorted(edges, values, side="right")
+        proportions = np.bincount(bins, minlength=len(edges) + 1) / len(values)
+
+        return {"edges": edges, "proportions": proportions}
+
+    def observe(self, features, predictions):
+        '''
+        Adds a batch of raw input features and their predictions to the live sketches
+        '''
+        # monitoring must never fail a prediction request
+        try:
+            with self._lock:
+                for column, sketch in self.numerical_sketches.items():
+                    sketch.update(features[column].to_numpy())
+                for column, sketch in self.categorical_sketches.items():
+                    sketch.update(features[column].to_numpy())
+                self.prediction_sketch.update(predictions)
+                self.observations += len(features)
+
+                self._current_window_observations += len(features)
+                if self._current_window_observations >= self.rotation_observations:
+                    for sketch in self._sketches():
+                        sketch.rotate()
+                    self._current_window_observations = 0
+        except Exception as e:
+            logging.warning(f"Data monitoring failed to observe batch: {e}")
+
+    def drift_report(self):
+        '''
+        Returns PSI and KS drift scores per feature and for the predictions
+        '''
+        try:
+            with self._lock:
+                report = {
+                    "observations": self.observations,
+                    "window_observations": int(self.prediction_sketch.counts.sum() + self.prediction_sketch.missing),
+                    "features": {},
+                }
+
+                for column, sketch in self.numerical_sketches.items():
+                    report["features"][column] = self._sketch_report(sketch, include_ks=True)
+                for column, sketch in self.categorical_sketches.items():
+                    report["features"][column] = self._sketch_report(sketch, include_ks=False)
+
+                report["prediction"] = self._sketch_report(self.prediction_sketch, include_ks=True)
+
+            return report
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def _sketch_report(self, sketch, include_ks):
+        counts = sketch.counts
+        total = counts.sum()
+        report = {"count": int(total), "missing": sketch.missing, "psi": None}
+        if include_ks:
+            report["ks"] = None
+
+        if total > 0:
+            actual = counts / total
+            report["psi"] = population_stability_index(
+                sketch.reference_proportions, actual, self.monitoring_config.EPSILON
+            )
+            if include_ks:
+                report["ks"] = ks_statistic(sketch.reference_proportions, actual)
+
+        return report
+
+    def _sketches(self):
+        return [*self.numerical_sketches.values(), *self.categorical_sketches.values(), self.prediction_sketch]
+
+    def reset(self):
+        with self._lock:
+            for sketch in self._sketches():
+                sketch.reset()
+            self.observations = 0
+            self._current_window_observations = 0
@@ -1,9 +1,11 @@
 import sys
 import os
+import time
 from dataclasses import dataclass
 
 import numpy as np
 import pandas as pd
+from joblib import parallel_backend # type: ignore
 
 from sklearn.compose import ColumnTransformer, make_column_transformer # type: ignore
 from sklearn.impute import SimpleImputer # type: ignore
@@ -13,18 +15,30 @@ from sklearn.preprocessing import OneHotEncoder, StandardScaler, RobustScaler #
 from src.exception import CustomException
 from src.logger import logging
 
-from src.utils import save_object, FeatureEngineering, LogTransformer
+from src.utils import save_object, relabel_imputed, FeatureEngineering, LogTransformer
+from src.components.data_monitoring import DataMonitor
+from src.components.transformation_engine import SharedStatisticsEngine
 
 @dataclass
 class DataTransformationConfig:
-    preprocessor_obj_file_path= os.path.join('artifacts', "preprocessor.pkl")
-    imputer_obj_file_path= os.path.join('artifacts', "imputer.pkl")
-    featengineering_obj_file_path= os.path.join('artifacts', "featengineering.pkl")
-    logtransformer_obj_file_path= os.path.join('artifacts', "logtransformer.pkl")
+    artifacts_dir: str = 'artifacts'
+    # keeps features in float32 and categories as integer codes, returning features and target separately
+    compact: bool = os.getenv("COMPACT_MODE", "false").lower() == "true"
+    # "sklearn" fits each transformer on its own scan, "shared_stats" fits them all from shared column statistics
+    engine: str = os.getenv("TRANSFORMATION_ENGINE", "sklearn")
+    n_jobs: int = int(os.getenv("TRANSFORMATION_N_JOBS", os.cpu_count() or 1))
+
+    def __post_init__(self):
+        self.preprocessor_obj_file_path= os.path.join(self.artifacts_dir, "preprocessor.pkl")
+        self.imputer_obj_file_path= os.path.join(self.artifacts_dir, "imputer.pkl")
+        self.featengineering_obj_file_path= os.path.join(self.artifacts_dir, "featengineering.pkl")
+        self.logtransformer_obj_file_path= os.path.join(self.artifacts_dir, "logtransformer.pkl")
+        self.reference_stats_file_path= os.path.join(self.artifacts_dir, "reference_stats.pkl")
 
 class DataTransformation:
-    def __init__(self):
-        self.data_transformation_config= DataTransformationConfig()
+    def __init__(self, data_transformation_config=None):
+        self.data_transformation_config= data_transformation_config or DataTransformationConfig()
+        self.stage_timings = {}
     
     def get_data_transformer_object(self):
         '''
@@ -32,6 +46,8 @@ class DataTransformation:
         '''
         try:
             categorical_features, numerical_features, robust_feats, std_feats, _, _, _, _ = self.get_separated_features()
+            # fit the column blocks in parallel, n_jobs is reset before the objects are saved for serving
+            n_jobs = self.data_transformation_config.n_jobs if self.data_transformation_config.n_jobs > 1 else None
 
             logging.info(f"Categorical columns: {categorical_features}")
             logging.info(f"Numerical columns: {numerical_features}")
@@ -40,14 +56,24 @@ class DataTransformation:
             imputer_processor = make_column_transformer(
                 (SimpleImputer(strategy="median", fill_value="missing_values"), numerical_features),
                 (SimpleImputer(strategy="most_frequent", fill_value="missing_values"), categorical_features),
+                n_jobs=n_jobs,
             )
+            # pandas output concatenates the imputed blocks column by column, keeping float32 features instead of
+            # casting everything to one object array alongside the categories
+            imputer_processor.set_output(transform="pandas")
 
             logging.info("Built Imputer")
 
             # Make tranformers for each feature
-            categorical_transformer = make_pipeline(
-                OneHotEncoder(handle_unknown="ignore", sparse_output=False), StandardScaler()
-            )
+            if self.data_transformation_config.compact:
+                # scaling one-hot indicators only changes them from 0/1 to dense floats
+                categorical_transformer = make_pipeline(
+                    OneHotEncoder(handle_unknown="ignore", sparse_output=False, dtype=np.float32)
+                )
+            else:
+                categorical_transformer = make_pipeline(
+                    OneHotEncoder(handle_unknown="ignore", sparse_output=False), StandardScaler()
+                )
 
             std_transformer = make_pipeline(StandardScaler())
 
@@ -58,6 +84,7 @@ class DataTransformation:
                 (std_transformer, std_feats),
                 (robust_transformer, robust_feats),
                 (categorical_transformer, categorical_features),
+                n_jobs=n_jobs,
             )
             
             logging.info("Built Preprocesser")
@@ -69,16 +96,19 @@ class DataTransformation:
         
     def initiate_data_transformation(self, TRAIN_PATH, TEST_PATH):
         try:
-            train_df= pd.read_csv(TRAIN_PATH)
-            test_df= pd.read_csv(TEST_PATH)
-            
-            logging.info("Reading train and test data completed")
+            compact = self.data_transformation_config.compact
+            engine = self.data_transformation_config.engine
+            timings = {}
+            stage_start = time.perf_counter()
             
-            logging.info("Obtaining preprocessing object")
+            read_dtypes = self.get_compact_dtypes() if compact else None
+            train_df= pd.read_csv(TRAIN_PATH, dtype=read_dtypes)
+            test_df= pd.read_csv(TEST_PATH, dtype=read_dtypes)
             
-            imputer_processor, preprocessing_obj= self.get_data_transformer_object()
+            logging.info("Reading train and test data completed")
+            timings["read"] = time.perf_counter() - stage_start
             
-            categorical_features, numerical_features, _, _, _, engineered_features, log_features, target = self.get_separated_features()
+            categorical_features, numerical_features, robust_feats, std_feats, _, _, log_features, target = self.get_separated_features()
             
             X_train= train_df.drop(columns=[target], axis=1)
             y_train= train_df[target]
@@ -86,56 +116,51 @@ class DataTransformation:
             X_test= test_df.drop(columns=[target], axis=1)
             y_test= test_df[target]
             
-            logging.info(
-                "Applying preprocessing object on training dataframe and testing dataframe."
+            stage_start = time.perf_counter()
+            # capture reference distributions of the raw inputs for drift monitoring
+            reference_stats = DataMonitor.build_reference_statistics(
+                X_train, y_train, numerical_features, categorical_features
             )
+            timings["reference_statistics"] = time.perf_counter() - stage_start
             
-            # perform imputation
-            imputed_X_train = pd.DataFrame(
-                imputer_processor.fit_transform(X_train), columns=X_train.columns
-            )
-            imputed_X_test = pd.DataFrame(
-                imputer_processor.transform(X_test), columns=X_train.columns
+            logging.info(
+                f"Applying preprocessing with the {engine} engine on training dataframe and testing dataframe."
             )
             
-            logging.info("Imputation Performed")
-
-            # Manually convert data types back to original
-            for column in numerical_features:
-                imputed_X_train[column] = imputed_X_train[column].astype(float)
-                imputed_X_test[column] = imputed_X_test[column].astype(float)
-
-            # apply feature endineering and data transformation to train and test data again
-            feat_engineer = FeatureEngineering()
-            transformer = LogTransformer(columns=log_features)
-            
-            logging.info("Perform feature engineering")
-
-            # perform feature engineering
-            engineered_X_train = feat_engineer.fit_transform(imputed_X_train)
-            engineered_X_test = feat_engineer.transform(imputed_X_test)
-
-            logging.info(f"Engineered Features: {engineered_features}")
-            logging.info("Perform Log transformation on Highly skewed features")
-            
-            # perform log transformation
-            transformed_engineered_X_train = transformer.fit_transform(engineered_X_train)
-            transformed_engineered_X_test = transformer.transform(engineered_X_test)
-            
-            logging.info(f"Log transformed Features: {log_features}")
-
-            X_train_arr=preprocessing_obj.fit_transform(transformed_engineered_X_train)
+            if engine == "shared_stats":
+                shared_stats_engine = SharedStatisticsEngine(
+                    categorical_features, numerical_features, std_feats, robust_feats, log_features,
+                    compact=compact, n_jobs=self.data_transformation_config.n_jobs,
+                )
+                imputer_processor, feat_engineer, transformer, preprocessing_obj, X_train_arr, X_test_arr = (
+                    shared_stats_engine.fit_transform(X_train, X_test)
+                )
+                timings.update(shared_stats_engine.stage_timings)
+            elif engine == "sklearn":
+                imputer_processor, feat_engineer, transformer, preprocessing_obj, X_train_arr, X_test_arr = (
+                    self.fit_transform_with_sklearn(X_train, X_test, timings)
+                )
+            else:
+                raise ValueError(f"Unknown transformation engine {engine}, expected sklearn or shared_stats")
             
-            X_test_arr=preprocessing_obj.transform(transformed_engineered_X_test)
-            
-            train_arr = np.c_[
-                X_train_arr, np.array(y_train)
-            ]
+            logging.info(
+                f"Transformed training features use {X_train_arr.nbytes / 2**20:.1f} MiB as {X_train_arr.dtype}"
+            )
             
-            test_arr = np.c_[
-                X_test_arr, np.array(y_test)
-            ]
+            if compact:
+                # features and target stay separate instead of being copied into one array
+                train_arr = (X_train_arr, y_train.to_numpy())
+                test_arr = (X_test_arr, y_test.to_numpy())
+            else:
+                train_arr = np.c_[
+                    X_train_arr, np.array(y_train)
+                ]
+                
+                test_arr = np.c_[
+                    X_test_arr, np.array(y_test)
+                ]
             
+            stage_start = time.perf_counter()
             save_object(
                 file_path=self.data_transformation_config.imputer_obj_file_path,
                 obj=imputer_processor
@@ -160,6 +185,19 @@ class DataTransformation:
             )
             logging.info(f"Saved preprocessing object.")
 
+            save_object(
+                file_path=self.data_transformation_config.reference_stats_file_path,
+                obj=reference_stats
+            )
+            logging.info(f"Saved reference statistics for data monitoring.")
+            timings["save"] = time.perf_counter() - stage_start
+
+            self.stage_timings = timings
+            logging.info(
+                "Data transformation stage timings: "
+                + ", ".join(f"{name} {seconds * 1000:.1f}ms" for name, seconds in timings.items())
+            )
+
             return (
                 train_arr,
                 test_arr,
@@ -172,6 +210,82 @@ class DataTransformation:
         except Exception as e:
             raise CustomException(e, sys)
     
+    def fit_transform_with_sklearn(self, X_train, X_test, timings):
+        '''
+        Fits the imputer, feature engineering, log transform and preprocessor one after another, recording
+        the duration of each stage in timings
+        '''
+        compact = self.data_transformation_config.compact
+        feature_dtype = np.float32 if compact else float
+        categorical_features, numerical_features, _, _, _, engineered_features, log_features, _ = self.get_separated_features()
+
+        logging.info("Obtaining preprocessing object")
+        
+        imputer_processor, preprocessing_obj= self.get_data_transformer_object()
+        
+        stage_start = time.perf_counter()
+        # perform imputation, column blocks are fitted on threads since worker processes cost more to start
+        # than the fit of a block
+        with parallel_backend("threading"):
+            imputed_X_train = relabel_imputed(imputer_processor.fit_transform(X_train), X_train.columns)
+            imputed_X_test = relabel_imputed(imputer_processor.transform(X_test), X_train.columns)
+        
+        logging.info("Imputation Performed")
+
+        # Manually convert data types back to original
+        for column in numerical_features:
+            imputed_X_train[column] = imputed_X_train[column].astype(feature_dtype)
+            imputed_X_test[column] = imputed_X_test[column].astype(feature_dtype)
+        if compact:
+            for column in categorical_features:
+                imputed_X_train[column] = imputed_X_train[column].astype("category")
+                imputed_X_test[column] = imputed_X_test[column].astype("category")
+        timings["impute"] = time.perf_counter() - stage_start
+
+        # apply feature endineering and data transformation to train and test data again
+        feat_engineer = FeatureEngineering(dtype=np.float32 if compact else None)
+        transformer = LogTransformer(columns=log_features)
+        
+        logging.info("Perform feature engineering")
+
+        stage_start = time.perf_counter()
+        # perform feature engineering
+        engineered_X_train = feat_engineer.fit_transform(imputed_X_train)
+        engineered_X_test = feat_engineer.transform(imputed_X_test)
+        timings["feature_engineering"] = time.perf_counter() - stage_start
+
+        logging.info(f"Engineered Features: {engineered_features}")
+        logging.info("Perform Log transformation on Highly skewed features")
+        
+        stage_start = time.perf_counter()
+        # perform log transformation
+        transformed_engineered_X_train = transformer.fit_transform(engineered_X_train)
+        transformed_engineered_X_test = transformer.transform(engineered_X_test)
+        timings["log_transform"] = time.perf_counter() - stage_start
+        
+        logging.info(f"Log transformed Features: {log_features}")
+
+        stage_start = time.perf_counter()
+        with parallel_backend("threading"):
+            X_train_arr=preprocessing_obj.fit_transform(transformed_engineered_X_train)
+            
+            X_test_arr=preprocessing_obj.transform(transformed_engineered_X_test)
+        timings["preprocess"] = time.perf_counter() - stage_start
+
+        # serving transforms a few rows at a time, where dispatching column blocks to threads costs more than it saves
+        imputer_processor.set_params(n_jobs=None)
+        preprocessing_obj.set_params(n_jobs=None)
+
+        return imputer_processor, feat_engineer, transformer, preprocessing_obj, X_train_arr, X_test_arr
+
+    def get_compact_dtypes(self):
+        categorical_features, numerical_features, _, _, _, _, _, target = self.get_separated_features()
+        
+        dtypes = {column: np.float32 for column in numerical_features + [target]}
+        dtypes.update({column: "category" for column in categorical_features})
+        
+        return dtypes
+    
     def get_separated_features(self):
             categorical_features = ['ocean_proximity']
             
@@ -0,0 +1,189 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from scipy import sparse # type: ignore
+
+from sklearn.ensemble import RandomForestRegressor, ExtraTreesRegressor, BaggingRegressor, GradientBoostingRegressor # type: ignore
+from sklearn.tree import DecisionTreeRegressor # type: ignore
+
+from src.exception import CustomException
+from src.logger import logging
+
+from src.utils import FeatureEngineering
+
+
+@dataclass
+class ModelExplainerConfig:
+    BACKGROUND_FILE_NAME = "explainer_background.pkl"
+    # number of explained rows kept per artifact set
+    CACHE_SIZE = 4096
+    BASE_VALUE_NAME = "base_value"
+    # XGBoost decision path contributions instead of exact tree SHAP, much faster on large batches
+    APPROXIMATE_TREE_SHAP = os.getenv("EXPLAINER_APPROXIMATE", "false").lower() == "true"
+
+
+def build_feature_map(imputer, preprocessor):
+    '''
+    Builds a (transformed features, input features) matrix spreading the attribution of every column produced by
+    the preprocessor over the raw input features it was computed from
+    '''
+    # the column transformer imputer output is relabelled with the input column order, so a label does not
+    # always hold the input column of the same name
+    labels = list(imputer.feature_names_in_)
+    sources = [name.split("__", 1)[-1] for name in imputer.get_feature_names_out()]
+    label_sources = dict(zip(labels, sources))
+
+    transformed_names = [name.split("__", 1)[-1] for name in preprocessor.get_feature_names_out()]
+    feature_map = np.zeros((len(transformed_names), len(labels)))
+
+    for i, name in enumerate(transformed_names):
+        if name in label_sources:
+            parents = [name]
+        elif name in FeatureEngineering.SOURCE_FEATURES:
+            parents = FeatureEngineering.SOURCE_FEATURES[name]
+        else:
+            # one-hot columns are named <feature>_<category>
+            parents = [label for label in labels if name.startswith(f"{label}_")]
+        if not parents:
+            raise ValueError(f"Cannot map transformed feature {name} to an input feature")
+
+        # derived features share their attribution equally between their inputs
+        for parent in parents:
+            feature_map[i, labels.index(label_sources[parent])] += 1 / len(parents)
+
+    return feature_map, labels
+
+
+def tree_path_table(tree, n_features, weight, feature_index=None):
+    '''
+    Sparse (nodes, features) table holding, for every non-root node, the weighted change in the node value
+    attributed to the feature split on by its parent
+    '''
+    tree_ = tree.tree_
+    node_ids = np.arange(tree_.node_count)
+    internal = tree_.children_left != -1
+
+    parent = np.full(tree_.node_count, -1)
+    parent[tree_.children_left[internal]] = node_ids[internal]
+    parent[tree_.children_right[internal]] = node_ids[internal]
+
+    values = tree_.value[:, 0, 0]
+    children = node_ids[parent >= 0]
+    features = tree_.feature[parent[children]]
+    if feature_index is not None:
+        features = np.asarray(feature_index)[features]
+
+    deltas = weight * (values[children] - values[parent[children]])
+    return sparse.csr_matrix((deltas, (children, features)), shape=(tree_.node_count, n_features))
+
+
+def weighted_trees(model):
+    '''
+    Returns the trees of a supported ensemble as (tree, weight, feature index) triples
+    '''
+    if isinstance(model, DecisionTreeRegressor):
+        return [(model, 1.0, None)]
+
+    if isinstance(model, (RandomForestRegressor, ExtraTreesRegressor)):
+        return [(tree, 1 / len(model.estimators_), None) for tree in model.estimators_]
+
+    if isinstance(model, BaggingRegressor) and all(isinstance(tree, DecisionTreeRegressor) for tree in model.estimators_):
+        return [
+            (tree, 1 / len(model.estimators_), features)
+            for tree, features in zip(model.estimators_, model.estimators_features_)
+        ]
+
+    if isinstance(model, GradientBoostingRegressor):
+        return [(tree, model.learning_rate, None) for tree in model.estimators_[:, 0]]
+
+    # AdaBoost predicts a weighted median of its trees, which no weighted sum of tree attributions adds up to
+    return None
+
+
+class ModelExplainer:
+    '''
+    Additive per-prediction attributions of the trained model mapped back to the raw input features.
+    XGBoost uses its native tree SHAP values, scikit-learn tree ensembles the decision path attributions of
+    every tree and linear models their exact coefficient contributions around the training mean.
+    '''
+    def __init__(self, model, imputer, preprocessor, background=None):
+        try:
+            self.model = model
+            self.feature_map, self.input_features = build_feature_map(imputer, preprocessor)
+            n_features = self.feature_map.shape[0]
+
+            trees = weighted_trees(model)
+
+            if hasattr(model, "get_booster"):
+                self.method = "tree_path" if ModelExplainerConfig.APPROXIMATE_TREE_SHAP else "tree_shap"
+            elif trees is not None:
+                self.method = "tree_path"
+                self.trees = trees
+                # one stacked table so that a batch is attributed with a single sparse product
+                self.path_table = sparse.vstack([
+                    tree_path_table(tree, n_features, weight, feature_index) for tree, weight, feature_index in trees
+                ]).tocsr()
+            elif hasattr(model, "coef_"):
+                if background is None:
+                    raise ValueError("Linear model attributions need the training feature means")
+                self.method = "linear"
+                self.coef = np.ravel(model.coef_)
+                self.background_mean = np.asarray(background["mean"])
+            else:
+                raise ValueError(f"Attributions are not supported for {type(model).__name__}")
+
+            logging.info(f"Built {self.method} explainer for {type(model).__name__}")
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def explain(self, X, predictions):
+        '''
+        Returns a DataFrame of input feature attributions and the base value, summing to the predictions
+        '''
+        if hasattr(self.model, "get_booster"):
+            from xgboost import DMatrix # type: ignore
+            contributions = self.model.get_booster().predict(
+                DMatrix(X), pred_contribs=True, approx_contribs=self.method == "tree_path"
+            )[:, :-1]
+        elif self.method == "tree_path":
+            paths = sparse.hstack([
+                tree.decision_path(X if feature_index is None else X[:, feature_index])
+                for tree, _, feature_index in self.trees
+            ]).tocsr()
+            contributions = (paths @ self.path_table).toarray()
+        else:
+            contributions = (X - self.background_mean) * self.coef
+
+        attributions = pd.DataFrame(contributions @ self.feature_map, columns=self.input_features)
+        attributions[ModelExplainerConfig.BASE_VALUE_NAME] = np.asarray(predictions) - contributions.sum(axis=1)
+        return attributions
+
+
+class PredictionCache:
+    '''
+    Least recently used cache of predictions and attributions keyed by the raw input row
+    '''
+    def __init__(self, max_size=ModelExplainerConfig.CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
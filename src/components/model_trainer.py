@@ -8,16 +8,25 @@ from sklearn.tree import DecisionTreeRegressor  # type: ignore
 from xgboost import XGBRegressor  # type: ignore
 
 from sklearn.metrics import r2_score  # type: ignore
+from sklearn.model_selection import train_test_split  # type: ignore
 
 from src.exception import CustomException  # type: ignore
 from src.logger import logging  # type: ignore
+from src.components.data_monitoring import DataMonitor
+from src.components.data_transformation import DataTransformationConfig
 
-from src.utils import save_object, evaluate_models
+from src.utils import save_object, load_object, evaluate_models, publish_artifact_set, split_features_target, QuantileIntervalModel
 
 
 @dataclass
 class ModelTrainingConfig:
     TRAINED_MODEL_FILE_PATH = os.path.join("artifacts", "model.pkl")
+    EXPLAINER_BACKGROUND_FILE_PATH = os.path.join("artifacts", "explainer_background.pkl")
+    INTERVAL_MODEL_FILE_PATH = os.path.join("artifacts", "interval_model.pkl")
+    # nominal coverage of the prediction intervals, e.g. 0.9, intervals are not trained when unset
+    PREDICTION_INTERVAL_COVERAGE = os.getenv("PREDICTION_INTERVAL_COVERAGE")
+    # when set, the trained artifacts are also published as artifacts/versions/<MODEL_VERSION>
+    MODEL_VERSION = os.getenv("MODEL_VERSION")
 
 
 class ModelTrainer:
@@ -27,12 +36,8 @@ class ModelTrainer:
     def initiate_model_trainer(self, train_array, test_array):
         try:
             logging.info("Split training and test input data")
-            X_train, y_train, X_test, y_test = (
-                train_array[:, :-1],
-                train_array[:, -1],
-                test_array[:, :-1],
-                test_array[:, -1],
-            )
+            X_train, y_train = split_features_target(train_array)
+            X_test, y_test = split_features_target(test_array)
             
             logging.info("Initialize models and hyper-parameters")
 
@@ -70,6 +75,23 @@ class ModelTrainer:
             )
             
             logging.info("Saved Best Model")
+            
+            # training feature means are the baseline of linear model attributions
+            save_object(
+                file_path=self.model_trainer_config.EXPLAINER_BACKGROUND_FILE_PATH,
+                obj={"mean": X_train.mean(axis=0)},
+            )
+            
+            self.update_prediction_reference(best_model, X_train)
+            
+            self.train_interval_model(X_train, y_train, X_test, y_test)
+            
+            if self.model_trainer_config.MODEL_VERSION:
+                version_dir = publish_artifact_set(
+                    self.model_trainer_config.MODEL_VERSION,
+                    os.path.dirname(self.model_trainer_config.TRAINED_MODEL_FILE_PATH),
+                )
+                logging.info(f"Published artifact set to {version_dir}")
 
             predicted = best_model.predict(X_test)
 
@@ -81,6 +103,54 @@ class ModelTrainer:
         except Exception as e:
             raise CustomException(e, sys)
 
+    def update_prediction_reference(self, best_model, X_train):
+        '''
+        Stores the distribution of the best model's training predictions as the drift reference of served predictions
+        '''
+        reference_stats_file_path = DataTransformationConfig(
+            artifacts_dir=os.path.dirname(self.model_trainer_config.TRAINED_MODEL_FILE_PATH)
+        ).reference_stats_file_path
+        if not os.path.exists(reference_stats_file_path):
+            logging.info("Reference statistics not found, prediction reference not updated")
+            return
+        
+        reference_stats = load_object(file_path=reference_stats_file_path)
+        reference_stats["prediction"] = DataMonitor.build_prediction_reference(best_model.predict(X_train))
+        save_object(file_path=reference_stats_file_path, obj=reference_stats)
+        logging.info("Saved prediction reference for data monitoring")
+
+    def train_interval_model(self, X_train, y_train, X_test, y_test):
+        '''
+        Trains lower and upper quantile models, calibrates them on a held-out part of the training data
+        and reports their coverage on the test data
+        '''
+        interval_model_path = self.model_trainer_config.INTERVAL_MODEL_FILE_PATH
+        
+        if not self.model_trainer_config.PREDICTION_INTERVAL_COVERAGE:
+            # intervals of an earlier model would not match the new preprocessing objects
+            if os.path.exists(interval_model_path):
+                os.remove(interval_model_path)
+                logging.info("Removed stale interval model")
+            return None
+        
+        coverage = float(self.model_trainer_config.PREDICTION_INTERVAL_COVERAGE)
+        logging.info(f"Training quantile models for {coverage:.0%} prediction intervals")
+        
+        X_fit, X_calibration, y_fit, y_calibration = train_test_split(
+            X_train, y_train, test_size=0.2, random_state=42
+        )
+        interval_model = QuantileIntervalModel(coverage=coverage, random_state=42).fit(X_fit, y_fit)
+        interval_model.calibrate(X_calibration, y_calibration)
+        logging.info(
+            f"Calibrated interval bounds by {interval_model.offset_}, "
+            f"test coverage {interval_model.coverage_score(X_test, y_test)}"
+        )
+        
+        save_object(file_path=interval_model_path, obj=interval_model)
+        logging.info("Saved interval model")
+        
+        return interval_model
+
     def init_models_and_params(self):
         models = {
             "Linear Regressor": LinearRegression(),
@@ -0,0 +1,183 @@
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.exception import CustomException
+from src.logger import logging
+
+from src.utils import FeatureEngineering, LogTransformer, StatsImputer, StatsPreprocessor
+
+
+def column_block_summary(df, columns):
+    '''
+    Mean, standard deviation and quartiles of every column in a block, ignoring missing values
+    '''
+    summary = {}
+    for column in columns:
+        values = df[column].to_numpy(dtype=np.float64)
+        values = values[~np.isnan(values)]
+        # one partition gives all three quartiles
+        q25, median, q75 = np.percentile(values, [25, 50, 75])
+        summary[column] = {
+            "mean": float(values.mean()),
+            "std": float(values.std()),
+            "q25": float(q25),
+            "median": float(median),
+            "q75": float(q75),
+        }
+    return summary
+
+
+def summarize_columns(df, columns, n_jobs):
+    '''
+    Computes the shared summary of the numerical columns in one pass, splitting them into blocks
+    summarized on a thread pool
+    '''
+    blocks = [list(block) for block in np.array_split(np.asarray(columns, dtype=object), min(n_jobs, len(columns)))]
+
+    if len(blocks) > 1:
+        with ThreadPoolExecutor(max_workers=len(blocks)) as executor:
+            summaries = list(executor.map(lambda block: column_block_summary(df, block), blocks))
+    else:
+        summaries = [column_block_summary(df, blocks[0])]
+
+    return {column: stats for summary in summaries for column, stats in summary.items()}
+
+
+def summarize_categories(df, columns):
+    '''
+    Sorted categories, counts and mode of every categorical column, ties going to the first category
+    '''
+    summary = {}
+    for column in columns:
+        counts = df[column].value_counts(dropna=True).sort_index()
+        counts = counts[counts > 0]
+        summary[column] = {
+            "categories": list(counts.index),
+            "counts": counts.to_numpy(dtype=np.float64),
+            "mode": counts.idxmax(),
+            "missing": int(df[column].isna().sum()),
+        }
+    return summary
+
+
+def handle_zero_scale(scale):
+    # constant columns are left centered but unscaled, as in scikit-learn
+    scale = np.asarray(scale, dtype=np.float64)
+    return np.where(scale < 10 * np.finfo(np.float64).eps, 1.0, scale)
+
+
+class SharedStatisticsEngine:
+    '''
+    Fits the imputer, feature engineering, log transform and preprocessor from two shared statistics passes
+    over column blocks instead of one scan per transformer, and materializes each transformed matrix once
+    '''
+    def __init__(self, categorical_features, numerical_features, std_feats, robust_feats, log_features,
+                 compact=False, n_jobs=1):
+        self.categorical_features = categorical_features
+        self.numerical_features = numerical_features
+        self.std_feats = std_feats
+        self.robust_feats = robust_feats
+        self.log_features = log_features
+        self.compact = compact
+        self.n_jobs = max(1, n_jobs)
+        self.stage_timings = {}
+
+    def fit_transform(self, X_train, X_test):
+        try:
+            timings = {}
+            stage_start = time.perf_counter()
+
+            def end_stage(name):
+                nonlocal stage_start
+                now = time.perf_counter()
+                timings[name] = now - stage_start
+                stage_start = now
+
+            # pass 1: imputation statistics of the raw inputs, the derived columns depend on the imputed values
+            raw_summary = summarize_columns(X_train, self.numerical_features, self.n_jobs)
+            category_summary = summarize_categories(X_train, self.categorical_features)
+            end_stage("raw_statistics")
+
+            fill_values = {column: raw_summary[column]["median"] for column in self.numerical_features}
+            fill_values.update({column: summary["mode"] for column, summary in category_summary.items()})
+            # same column mapping as the scikit-learn imputer, so that both engines feed the model identical features
+            imputer = StatsImputer(
+                fill_values=fill_values, source_columns=self.numerical_features + self.categorical_features
+            ).fit(X_train)
+
+            imputed_X_train = imputer.transform(X_train)
+            imputed_X_test = imputer.transform(X_test)
+            end_stage("impute")
+
+            feat_engineer = FeatureEngineering(dtype=np.float32 if self.compact else None)
+            engineered_X_train = feat_engineer.fit_transform(imputed_X_train)
+            engineered_X_test = feat_engineer.transform(imputed_X_test)
+            end_stage("feature_engineering")
+
+            transformer = LogTransformer(columns=self.log_features)
+            transformed_X_train = transformer.fit_transform(engineered_X_train)
+            transformed_X_test = transformer.transform(engineered_X_test)
+            end_stage("log_transform")
+
+            # pass 2: one summary of the derived columns serves both the standard and the robust scaler
+            derived_summary = summarize_columns(transformed_X_train, self.std_feats + self.robust_feats, self.n_jobs)
+            end_stage("derived_statistics")
+
+            preprocessor = self.build_preprocessor(derived_summary, category_summary)
+            end_stage("fit_from_statistics")
+
+            X_train_arr = preprocessor.transform(transformed_X_train)
+            X_test_arr = preprocessor.transform(transformed_X_test)
+            end_stage("materialize")
+
+            self.stage_timings = timings
+            logging.info(
+                "Shared statistics engine stage timings: "
+                + ", ".join(f"{name} {seconds * 1000:.1f}ms" for name, seconds in timings.items())
+            )
+
+            return imputer, feat_engineer, transformer, preprocessor, X_train_arr, X_test_arr
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def build_preprocessor(self, derived_summary, category_summary):
+        std_stats = [derived_summary[column] for column in self.std_feats]
+        robust_stats = [derived_summary[column] for column in self.robust_feats]
+
+        centers = [stats["mean"] for stats in std_stats] + [stats["median"] for stats in robust_stats]
+        scales = [stats["std"] for stats in std_stats] + [stats["q75"] - stats["q25"] for stats in robust_stats]
+
+        categories = {}
+        category_centers, category_scales = [], []
+        for column in self.categorical_features:
+            summary = category_summary[column]
+            categories[column] = summary["categories"]
+
+            # imputed rows all take the mode
+            counts = summary["counts"].copy()
+            counts[summary["categories"].index(summary["mode"])] += summary["missing"]
+            frequencies = counts / counts.sum()
+
+            if self.compact:
+                category_centers.append(np.zeros_like(frequencies))
+                category_scales.append(np.ones_like(frequencies))
+            else:
+                # standardized indicators, as a StandardScaler after the one-hot encoder
+                category_centers.append(frequencies)
+                category_scales.append(np.sqrt(frequencies * (1 - frequencies)))
+
+        dtype = np.float32 if self.compact else np.float64
+        return StatsPreprocessor(
+            numerical_columns=self.std_feats + self.robust_feats,
+            prefixes=["standard"] * len(self.std_feats) + ["robust"] * len(self.robust_feats),
+            centers=np.asarray(centers, dtype=dtype),
+            scales=handle_zero_scale(scales).astype(dtype),
+            categories=categories,
+            category_centers=np.concatenate(category_centers).astype(dtype),
+            category_scales=handle_zero_scale(np.concatenate(category_scales)).astype(dtype),
+            dtype=dtype,
+        )
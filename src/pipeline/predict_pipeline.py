@@ -1,51 +1,353 @@
+import os
 import sys
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
 import pandas as pd
 from src.exception import CustomException
-from src.utils import load_object
+from src.logger import logging
+from src.utils import load_object, relabel_imputed
+from src.components.model_explainer import ModelExplainer, ModelExplainerConfig, PredictionCache
 
-class PredictionPipeline:
-    def __init__(self):
-        pass
+@dataclass
+class ArtifactSetConfig:
+    MODEL_FILE_NAME = 'model.pkl'
+    IMPUTER_FILE_NAME = 'imputer.pkl'
+    FEAT_ENGINEERING_FILE_NAME = 'featengineering.pkl'
+    LOG_TRANSFORMER_FILE_NAME = 'logtransformer.pkl'
+    PREPROCESSOR_FILE_NAME = 'preprocessor.pkl'
+    # optional, only produced when ModelTrainer trains prediction intervals
+    INTERVAL_MODEL_FILE_NAME = 'interval_model.pkl'
+
+@dataclass
+class ModelServingConfig:
+    ARTIFACTS_DIR = 'artifacts'
+    VERSIONS_DIR = os.path.join('artifacts', 'versions')
+    # versions are sub-directories of VERSIONS_DIR, the primary defaults to the top level artifacts
+    PRIMARY_VERSION = os.getenv("PRIMARY_MODEL_VERSION")
+    CANDIDATE_VERSION = os.getenv("CANDIDATE_MODEL_VERSION")
+    CANDIDATE_TRAFFIC_PERCENT = float(os.getenv("CANDIDATE_TRAFFIC_PERCENT", "0"))
+    SHADOW_VERSION = os.getenv("SHADOW_MODEL_VERSION")
+    # shadow requests beyond this backlog are dropped instead of queueing without bound
+    MAX_PENDING_SHADOW_REQUESTS = 64
+    # number of most recent latencies and prediction deltas kept per variant
+    METRICS_WINDOW = 2048
+
+@dataclass
+class PredictionResult:
+    predictions: np.ndarray
+    # per-input feature attributions and base value, one row per prediction
+    attributions: pd.DataFrame = None
+    # (n, 2) array of lower and upper bounds
+    intervals: np.ndarray = None
+    variant: str = "primary"
+
+class ArtifactSet:
+    '''
+    Model and data preprocessing objects of one trained version, loaded once and reused across requests
+    '''
+    def __init__(self, artifacts_dir):
+        try:
+            self.artifacts_dir = artifacts_dir
+            config = ArtifactSetConfig()
+            
+            # load objects
+            self.model = load_object(file_path= os.path.join(artifacts_dir, config.MODEL_FILE_NAME))
+            self.imputer = load_object(file_path= os.path.join(artifacts_dir, config.IMPUTER_FILE_NAME))
+            self.feat_engineer = load_object(file_path= os.path.join(artifacts_dir, config.FEAT_ENGINEERING_FILE_NAME))
+            self.transformer = load_object(file_path= os.path.join(artifacts_dir, config.LOG_TRANSFORMER_FILE_NAME))
+            self.preprocessor = load_object(file_path= os.path.join(artifacts_dir, config.PREPROCESSOR_FILE_NAME))
+            
+            interval_model_path = os.path.join(artifacts_dir, config.INTERVAL_MODEL_FILE_NAME)
+            self.interval_model = load_object(file_path= interval_model_path) if os.path.exists(interval_model_path) else None
+            
+            # attribution tables are only built once the first explanation is requested
+            self._explainer = None
+            self._explainer_error = None
+            self._explainer_lock = threading.Lock()
+            self.prediction_cache = PredictionCache()
+            
+            logging.info(f"Loaded artifact set from {artifacts_dir}")
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    def transform(self, features):
+        # perform imputation
+        imputed_data = relabel_imputed(self.imputer.transform(features), features.columns)
+        # Manually convert data types back to original
+        numerical_features = [
+            'longitude',
+            'latitude',
+            'housing_median_age',
+            'total_bedrooms',
+            'total_rooms',
+            'population',
+            'households',
+            'median_income'
+        ]
+        for column in numerical_features:
+            imputed_data[column] = imputed_data[column].astype(float)
+        
+        engineered_data = self.feat_engineer.transform(imputed_data)
+        engineered_transformed_data = self.transformer.transform(engineered_data)
+        return self.preprocessor.transform(engineered_transformed_data)
     
     def predict(self, features):
+        return self.model.predict(self.transform(features))
+    
+    @property
+    def explainer(self):
+        if self._explainer is None:
+            with self._explainer_lock:
+                if self._explainer is None and self._explainer_error is None:
+                    background_path = os.path.join(self.artifacts_dir, ModelExplainerConfig.BACKGROUND_FILE_NAME)
+                    background = load_object(file_path= background_path) if os.path.exists(background_path) else None
+                    try:
+                        self._explainer = ModelExplainer(self.model, self.imputer, self.preprocessor, background)
+                    except Exception as e:
+                        # an unsupported model fails the same way every time, so it is not rebuilt on every request
+                        self._explainer_error = e
+                if self._explainer_error is not None:
+                    raise self._explainer_error
+        return self._explainer
+    
+    def explainer_available(self):
+        # the build failure is cached and logged when the explainers are warmed up, so checking is cheap
+        try:
+            self.explainer
+            return True
+        except Exception:
+            return False
+    
+    def predict_detailed(self, features, explain=False, interval=False):
+        '''
+        Returns the predictions with optional attributions and prediction intervals, all computed from a single
+        transformation of the features. Attributions are left empty when the model cannot be explained.
+        '''
+        interval = interval and self.interval_model is not None
+        if explain and self.explainer_available():
+            return self._predict_and_explain(features, interval)
+        
+        data_scaled = self.transform(features)
+        preds = self.model.predict(data_scaled)
+        intervals = self.interval_model.predict_interval(data_scaled, preds) if interval else None
+        return PredictionResult(preds, intervals=intervals)
+    
+    def _predict_and_explain(self, features, interval):
+        # only the rows missing from the cache are transformed, in one batch, rows cached without interval
+        # bounds count as missing when bounds are requested
+        keys = list(features.itertuples(index=False, name=None))
+        entries = [self.prediction_cache.get(key) for key in keys]
+        missing = [i for i, entry in enumerate(entries) if entry is None or (interval and entry[2] is None)]
+        
+        if missing:
+            data_scaled = self.transform(features.iloc[missing])
+            preds = self.model.predict(data_scaled)
+            attributions = self.explainer.explain(data_scaled, preds).to_dict(orient="records")
+            intervals = [None] * len(missing)
+            if interval:
+                intervals = self.interval_model.predict_interval(data_scaled, preds)
+            for i, pred, attribution, bounds in zip(missing, preds, attributions, intervals):
+                entries[i] = (pred, attribution, bounds)
+                self.prediction_cache.put(keys[i], entries[i])
+        
+        return PredictionResult(
+            predictions=np.array([pred for pred, _, _ in entries]),
+            attributions=pd.DataFrame([attribution for _, attribution, _ in entries]),
+            intervals=np.array([bounds for _, _, bounds in entries]) if interval else None,
+        )
+
+@lru_cache(maxsize=None)
+def load_artifact_set(artifacts_dir):
+    return ArtifactSet(artifacts_dir)
+
+class VariantMetrics:
+    '''
+    Fixed-size windows of latencies and prediction deltas of one serving variant
+    '''
+    def __init__(self, window):
+        self.latencies = np.zeros(window)
+        self.deltas = np.zeros(window)
+        self.requests = 0
+        self.comparisons = 0
+        self._lock = threading.Lock()
+    
+    def record_latency(self, latency):
+        with self._lock:
+            self.latencies[self.requests % len(self.latencies)] = latency
+            self.requests += 1
+    
+    def record_deltas(self, deltas):
+        with self._lock:
+            for delta in deltas:
+                self.deltas[self.comparisons % len(self.deltas)] = delta
+                self.comparisons += 1
+    
+    def report(self):
+        with self._lock:
+            latencies = self.latencies[:min(self.requests, len(self.latencies))] * 1000
+            deltas = self.deltas[:min(self.comparisons, len(self.deltas))]
+            report = {"requests": self.requests, "comparisons": self.comparisons}
+            if len(latencies):
+                report["latency_ms"] = {
+                    "mean": float(latencies.mean()),
+                    "p50": float(np.percentile(latencies, 50)),
+                    "p99": float(np.percentile(latencies, 99)),
+                }
+            if len(deltas):
+                report["prediction_delta"] = {
+                    "mean": float(deltas.mean()),
+                    "mean_absolute": float(np.abs(deltas).mean()),
+                    "max_absolute": float(np.abs(deltas).max()),
+                }
+            return report
+
+class ModelRouter:
+    '''
+    Routes prediction requests between a primary and a candidate artifact set and optionally
+    replays them against a shadow artifact set off the request path
+    '''
+    def __init__(self, primary, candidate=None, candidate_traffic_percent=0.0, shadow=None):
+        self.serving_config = ModelServingConfig()
+        
+        self.variants = {"primary": primary}
+        if candidate is not None:
+            self.variants["candidate"] = candidate
+        self.candidate_traffic_percent = candidate_traffic_percent if candidate is not None else 0.0
+        self.shadow = shadow
+        
+        self.metrics = {name: VariantMetrics(self.serving_config.METRICS_WINDOW) for name in self.variants}
+        
+        if shadow is not None:
+            self.metrics["shadow"] = VariantMetrics(self.serving_config.METRICS_WINDOW)
+            # shadow predictions are compared against the prediction served for the same request, kept apart
+            # per served variant so that primary and candidate baselines are not mixed
+            self.shadow_deltas = {name: VariantMetrics(self.serving_config.METRICS_WINDOW) for name in self.variants}
+            self._shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow-model")
+            self._shadow_slots = threading.BoundedSemaphore(self.serving_config.MAX_PENDING_SHADOW_REQUESTS)
+            self.dropped_shadow_requests = 0
+            self._dropped_lock = threading.Lock()
+    
+    @classmethod
+    def from_config(cls):
         try:
-            # define paths to data preprocessing objects and models
-            MODEL_PATH = 'artifacts/model.pkl'
-            IMPUTER_PATH = 'artifacts/imputer.pkl'
-            FEAT_ENGINEERING_PATH = 'artifacts/featengineering.pkl'
-            LOG_TRANSFORMER_PATH = 'artifacts/logtransformer.pkl'
-            PREPROCESSOR_PATH = 'artifacts/preprocessor.pkl'
+            config = ModelServingConfig()
             
-            # load objects
-            model = load_object(file_path = MODEL_PATH)
-            imputer = load_object(file_path= IMPUTER_PATH)
-            feat_engineer = load_object(file_path= FEAT_ENGINEERING_PATH)
-            transformer = load_object(file_path= LOG_TRANSFORMER_PATH)
-            preprocessor = load_object(file_path= PREPROCESSOR_PATH)
+            def version_dir(version):
+                return os.path.join(config.VERSIONS_DIR, version)
+            
+            primary_dir = version_dir(config.PRIMARY_VERSION) if config.PRIMARY_VERSION else config.ARTIFACTS_DIR
+            candidate = load_artifact_set(version_dir(config.CANDIDATE_VERSION)) if config.CANDIDATE_VERSION else None
+            shadow = load_artifact_set(version_dir(config.SHADOW_VERSION)) if config.SHADOW_VERSION else None
+            
+            logging.info(
+                f"Serving primary {primary_dir}, candidate {config.CANDIDATE_VERSION} "
+                f"at {config.CANDIDATE_TRAFFIC_PERCENT}% and shadow {config.SHADOW_VERSION}"
+            )
             
-            # perform imputation
-            imputed_data = pd.DataFrame(
-                imputer.fit_transform(features), columns=features.columns
+            return cls(
+                primary=load_artifact_set(primary_dir),
+                candidate=candidate,
+                candidate_traffic_percent=config.CANDIDATE_TRAFFIC_PERCENT,
+                shadow=shadow,
             )
-            # Manually convert data types back to original
-            numerical_features = [
-                'longitude',
-                'latitude',
-                'housing_median_age',
-                'total_bedrooms',
-                'total_rooms',
-                'population',
-                'households',
-                'median_income'
-            ]
-            for column in numerical_features:
-                imputed_data[column] = imputed_data[column].astype(float)
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+    
+    def route(self):
+        if self.candidate_traffic_percent > 0 and random.random() * 100 < self.candidate_traffic_percent:
+            return "candidate"
+        return "primary"
+    
+    def predict(self, features, explain=False, interval=False):
+        variant = self.route()
+        
+        start = time.perf_counter()
+        result = self.variants[variant].predict_detailed(features, explain=explain, interval=interval)
+        result.variant = variant
+        self.metrics[variant].record_latency(time.perf_counter() - start)
+        
+        if self.shadow is not None:
+            self._submit_shadow(features, result.predictions, variant)
+        
+        return result
+    
+    def _submit_shadow(self, features, served_preds, served_variant):
+        if not self._shadow_slots.acquire(blocking=False):
+            with self._dropped_lock:
+                self.dropped_shadow_requests += 1
+            return
+        self._shadow_executor.submit(self._run_shadow, features, served_preds, served_variant)
+    
+    def _run_shadow(self, features, served_preds, served_variant):
+        try:
+            start = time.perf_counter()
+            shadow_preds = self.shadow.predict(features)
+            self.metrics["shadow"].record_latency(time.perf_counter() - start)
+            self.shadow_deltas[served_variant].record_deltas(np.asarray(shadow_preds) - np.asarray(served_preds))
+        except Exception as e:
+            logging.warning(f"Shadow model prediction failed: {e}")
+        finally:
+            self._shadow_slots.release()
+    
+    def metrics_report(self):
+        report = {
+            "candidate_traffic_percent": self.candidate_traffic_percent,
+            "variants": {name: metrics.report() for name, metrics in self.metrics.items()},
+        }
+        if self.shadow is not None:
+            report["shadow_deltas"] = {name: metrics.report() for name, metrics in self.shadow_deltas.items()}
+            with self._dropped_lock:
+                report["dropped_shadow_requests"] = self.dropped_shadow_requests
+        return report
+
+class PredictionPipeline:
+    def __init__(self, monitor=None, router=None):
+        # optional DataMonitor tracking drift of the served inputs and predictions
+        self.monitor = monitor
+        # optional ModelRouter splitting traffic between model versions, defaults to the top level artifacts
+        self.router = router
+        self.last_variant = "primary"
+    
+    def predict(self, features):
+        return self.predict_detailed(features).predictions
+    
+    def predict_with_explanation(self, features):
+        '''
+        Returns the predictions with a DataFrame of per-input feature attributions and the base value summing to them,
+        None when the model cannot be explained
+        '''
+        result = self.predict_detailed(features, explain=True)
+        return result.predictions, result.attributions
+    
+    def predict_with_interval(self, features):
+        '''
+        Returns the predictions with an (n, 2) array of interval bounds, None when no interval model was trained
+        '''
+        result = self.predict_detailed(features, interval=True)
+        return result.predictions, result.intervals
+    
+    def predict_detailed(self, features, explain=False, interval=False):
+        try:
+            if self.router is not None:
+                result = self.router.predict(features, explain=explain, interval=interval)
+                self.last_variant = result.variant
+            else:
+                result = load_artifact_set(ModelServingConfig.ARTIFACTS_DIR).predict_detailed(
+                    features, explain=explain, interval=interval
+                )
+            
+            if self.monitor is not None:
+                self.monitor.observe(features, result.predictions)
             
-            engineered_data = feat_engineer.transform(imputed_data)
-            engineered_transformed_data = transformer.transform(engineered_data)
-            data_scaled = preprocessor.transform(engineered_transformed_data)
-            preds = model.predict(data_scaled)
-            return preds
+            return result
         
         except Exception as e:
             raise CustomException(e, sys)
@@ -0,0 +1,316 @@
+'''
+Runs ingestion -> transformation -> training for several seeds and train / test splits on a process pool,
+checkpointing every completed unit so that an interrupted run resumes where it stopped, and aggregates
+the score distributions of every model family.
+
+Run from the root of the workspace, for example:
+
+    python src/pipeline/train_pipeline.py --seeds 0 1 2 --splits 5 --workers 8
+'''
+import os
+import sys
+import json
+import time
+import heapq
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from typing import List
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import KFold, train_test_split # type: ignore
+
+from src.exception import CustomException
+from src.logger import logging
+
+from src.components.data_acquisition import DatasetAcquisition
+from src.components.data_transformation import DataTransformation, DataTransformationConfig
+from src.components.model_trainer import ModelTrainer
+from src.utils import evaluate_model, split_features_target, write_json, read_json
+
+
+@dataclass
+class TrainingOrchestrationConfig:
+    ORCHESTRATION_DIR = os.path.join("artifacts", "orchestration")
+    # relative cost of a single fit of each model family, multiplied by the size of its parameter grid
+    MODEL_COST_WEIGHTS = {
+        "Linear Regressor": 1,
+        "Ridge Regressor": 1,
+        "Decision Tree Regressor": 5,
+        "Random Forest Regressor": 150,
+        "Bagging Regressor": 40,
+        "Gradient Boosting Regressor": 100,
+        "AdaBoost Regressor": 30,
+        "XGBRegressor": 10,
+    }
+    PREPARE_COST = 5
+    run_name: str = "default"
+    seeds: List[int] = field(default_factory=lambda: [42])
+    n_splits: int = 1
+    test_size: float = 0.2
+    families: List[str] = field(default_factory=list)
+    max_workers: int = os.cpu_count() or 1
+
+
+def prepare_split(unit_dir, raw_data_path, seed, split, n_splits, test_size):
+    '''
+    Splits the raw data for one (seed, split) unit and fits the data transformation on it
+    '''
+    df = pd.read_pickle(raw_data_path)
+
+    if n_splits > 1:
+        train_idx, test_idx = list(KFold(n_splits=n_splits, shuffle=True, random_state=seed).split(df))[split]
+        train_set, test_set = df.iloc[train_idx], df.iloc[test_idx]
+    else:
+        train_set, test_set = train_test_split(df, test_size=test_size, random_state=seed)
+
+    train_path = os.path.join(unit_dir, "train.csv")
+    test_path = os.path.join(unit_dir, "test.csv")
+    train_set.to_csv(train_path, index=False, header=True)
+    test_set.to_csv(test_path, index=False, header=True)
+
+    # the process pool already keeps every core busy
+    data_transformation = DataTransformation(DataTransformationConfig(artifacts_dir=unit_dir, n_jobs=1))
+    train_arr, test_arr, _, _, _, _ = data_transformation.initiate_data_transformation(train_path, test_path)
+
+    for name, data in [("train", train_arr), ("test", test_arr)]:
+        X, y = split_features_target(data)
+        np.save(os.path.join(unit_dir, f"{name}_X.npy"), X)
+        np.save(os.path.join(unit_dir, f"{name}_y.npy"), y)
+
+    return {"train_rows": len(train_set), "test_rows": len(test_set)}
+
+
+def train_family(unit_dir, family, seed):
+    '''
+    Tunes and scores one model family on the transformed data of a (seed, split) unit
+    '''
+    models, params = ModelTrainer().init_models_and_params()
+    model = models[family]
+    if "random_state" in model.get_params():
+        model.set_params(random_state=seed)
+    # the process pool already keeps every core busy, estimators such as XGBoost default to all of them
+    if "n_jobs" in model.get_params():
+        model.set_params(n_jobs=1)
+
+    X_train, y_train, X_test, y_test = [
+        np.load(os.path.join(unit_dir, f"{name}.npy")) for name in ["train_X", "train_y", "test_X", "test_y"]
+    ]
+
+    return evaluate_model(model, params[family], X_train, y_train, X_test, y_test, n_jobs=1)
+
+
+def run_unit(kind, unit_dir, checkpoint_path, kwargs):
+    start = time.perf_counter()
+    if kind == "prepare":
+        result = prepare_split(unit_dir, **kwargs)
+    else:
+        result = train_family(unit_dir, **kwargs)
+    result["duration_seconds"] = time.perf_counter() - start
+
+    write_json(checkpoint_path, result)
+    return result
+
+
+class TrainingOrchestrator:
+    '''
+    Schedules the preparation and training units of every (seed, split) on a process pool, always starting
+    the ready unit with the largest estimated remaining cost first
+    '''
+    def __init__(self, orchestration_config=None):
+        self.orchestration_config = orchestration_config or TrainingOrchestrationConfig()
+        self.run_dir = os.path.join(self.orchestration_config.ORCHESTRATION_DIR, self.orchestration_config.run_name)
+
+        _, params = ModelTrainer().init_models_and_params()
+        self.params = params
+        self.families = self.orchestration_config.families or list(params)
+
+    def estimate_cost(self, family):
+        grid_size = int(np.prod([len(values) for values in self.params[family].values()])) if self.params[family] else 1
+        return grid_size * self.orchestration_config.MODEL_COST_WEIGHTS.get(family, 10)
+
+    def initiate_orchestration(self):
+        try:
+            config = self.orchestration_config
+            os.makedirs(self.run_dir, exist_ok=True)
+            self._check_run_config()
+
+            # every unit works from the same typed snapshot of the verified dataset
+            raw_data_path = os.path.join(self.run_dir, "data.pkl")
+            if not os.path.exists(raw_data_path):
+                tmp_path = f"{raw_data_path}.tmp"
+                DatasetAcquisition().load_dataset().to_pickle(tmp_path)
+                os.replace(tmp_path, raw_data_path)
+
+            family_costs = {family: self.estimate_cost(family) for family in self.families}
+            units = self._build_units(raw_data_path)
+
+            pending = {}
+            ready = []
+            for unit_id, unit in units.items():
+                if os.path.exists(unit["checkpoint_path"]):
+                    continue
+                if unit["depends_on"] is None or os.path.exists(units[unit["depends_on"]]["checkpoint_path"]):
+                    self._push_ready(ready, unit_id, unit, family_costs)
+                else:
+                    pending.setdefault(unit["depends_on"], []).append(unit_id)
+
+            remaining = len(ready) + sum(len(unit_ids) for unit_ids in pending.values())
+            logging.info(f"Orchestration {config.run_name}: {remaining} of {len(units)} units left to run")
+
+            with ProcessPoolExecutor(max_workers=config.max_workers) as executor:
+                running = {}
+                while ready or running:
+                    while ready and len(running) < config.max_workers:
+                        _, unit_id = heapq.heappop(ready)
+                        unit = units[unit_id]
+                        os.makedirs(unit["unit_dir"], exist_ok=True)
+                        future = executor.submit(run_unit, unit["kind"], unit["unit_dir"], unit["checkpoint_path"], unit["kwargs"])
+                        running[future] = unit_id
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        unit_id = running.pop(future)
+                        result = future.result()
+                        logging.info(f"Completed unit {unit_id} in {result['duration_seconds']:.1f}s")
+                        for dependent_id in pending.pop(unit_id, []):
+                            self._push_ready(ready, dependent_id, units[dependent_id], family_costs)
+
+            summary = self.aggregate_results(units)
+            write_json(os.path.join(self.run_dir, "summary.json"), summary)
+            logging.info(f"Orchestration {config.run_name} completed, best family {summary['best_family']}")
+
+            return summary
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def _run_config(self):
+        config = self.orchestration_config
+        return {
+            "seeds": list(config.seeds),
+            "n_splits": config.n_splits,
+            "test_size": config.test_size,
+            "families": list(self.families),
+        }
+
+    def _check_run_config(self):
+        '''
+        Records the configuration of a new run, and refuses to resume a run whose checkpoints were produced with
+        different seeds, splits or families since the unit paths only encode the seed and split index
+        '''
+        config_path = os.path.join(self.run_dir, "config.json")
+        run_config = self._run_config()
+
+        if not os.path.exists(config_path):
+            write_json(config_path, run_config)
+            return
+
+        saved_config = read_json(config_path)
+        if saved_config != run_config:
+            raise ValueError(
+                f"Run {self.orchestration_config.run_name} was started with {saved_config}, not {run_config}; "
+                "use another run name or remove its directory to start over"
+            )
+
+    def _build_units(self, raw_data_path):
+        config = self.orchestration_config
+        units = {}
+
+        for seed in config.seeds:
+            for split in range(config.n_splits):
+                unit_dir = os.path.join(self.run_dir, f"seed_{seed}", f"split_{split}")
+                prepare_id = f"seed_{seed}/split_{split}/prepare"
+                units[prepare_id] = {
+                    "kind": "prepare",
+                    "unit_dir": unit_dir,
+                    "checkpoint_path": os.path.join(unit_dir, "prepare.json"),
+                    "depends_on": None,
+                    "kwargs": {
+                        "raw_data_path": raw_data_path,
+                        "seed": seed,
+                        "split": split,
+                        "n_splits": config.n_splits,
+                        "test_size": config.test_size,
+                    },
+                }
+
+                for family in self.families:
+                    units[f"seed_{seed}/split_{split}/{family}"] = {
+                        "kind": "train",
+                        "family": family,
+                        "unit_dir": unit_dir,
+                        "checkpoint_path": os.path.join(unit_dir, f"{family.replace(' ', '_')}.json"),
+                        "depends_on": prepare_id,
+                        "kwargs": {"family": family, "seed": seed},
+                    }
+
+        return units
+
+    def _push_ready(self, ready, unit_id, unit, family_costs):
+        if unit["kind"] == "prepare":
+            # a preparation unit unlocks the training of every family on its split
+            cost = self.orchestration_config.PREPARE_COST + sum(family_costs.values())
+        else:
+            cost = family_costs[unit["family"]]
+        heapq.heappush(ready, (-cost, unit_id))
+
+    def _family_checkpoints(self, family):
+        config = self.orchestration_config
+        return [
+            os.path.join(self.run_dir, f"seed_{seed}", f"split_{split}", f"{family.replace(' ', '_')}.json")
+            for seed in config.seeds for split in range(config.n_splits)
+        ]
+
+    def aggregate_results(self, units):
+        '''
+        Summarises the cross-validation and test score distributions of each family over all seeds and splits
+        '''
+        families = {}
+        for family in self.families:
+            results = [read_json(path) for path in self._family_checkpoints(family)]
+            summary = {"units": len(results)}
+            for score in ["cv_score", "train_score", "test_score"]:
+                values = np.array([result[score] for result in results])
+                summary[score] = {
+                    "mean": float(values.mean()),
+                    "std": float(values.std(ddof=1)) if len(values) > 1 else 0.0,
+                    "min": float(values.min()),
+                    "max": float(values.max()),
+                }
+            summary["mean_duration_seconds"] = float(np.mean([result["duration_seconds"] for result in results]))
+            families[family] = summary
+
+        # selecting on cross-validation scores averaged over seeds and splits keeps the test splits for reporting
+        best_family = max(families, key=lambda family: families[family]["cv_score"]["mean"])
+
+        return {
+            "run_name": self.orchestration_config.run_name,
+            "seeds": self.orchestration_config.seeds,
+            "n_splits": self.orchestration_config.n_splits,
+            "best_family": best_family,
+            "families": families,
+        }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train every model family over several seeds and splits")
+    parser.add_argument("--run-name", default="default", help="checkpoints of a run with the same name are resumed")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[42])
+    parser.add_argument("--splits", type=int, default=1, help="K-fold splits per seed, 1 for a single train / test split")
+    parser.add_argument("--families", nargs="+", default=[], help="model families to train, defaults to all")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    orchestrator = TrainingOrchestrator(TrainingOrchestrationConfig(
+        run_name=args.run_name,
+        seeds=args.seeds,
+        n_splits=args.splits,
+        families=args.families,
+        max_workers=args.workers,
+    ))
+    print(json.dumps(orchestrator.initiate_orchestration(), indent=2))
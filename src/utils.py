@@ -1,12 +1,16 @@
 import os
 import sys
+import json
 
 import numpy as np 
 import pandas as pd
 import dill # type: ignore
 import pickle
+import shutil
+import tempfile
 
 from sklearn.base import BaseEstimator, TransformerMixin # type: ignore
+from xgboost import XGBRegressor # type: ignore
 from sklearn.metrics import r2_score # type: ignore
 from sklearn.model_selection import GridSearchCV # type: ignore
 
@@ -31,11 +35,60 @@ def load_object(file_path):
             return pickle.load(file_obj)
     except Exception as e:
         raise CustomException(e, sys)
+
+def write_json(file_path, obj):
+    # write through a temporary file so that an interrupted run never leaves a truncated file
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, "w") as file_obj:
+        json.dump(obj, file_obj, indent=2)
+    os.replace(tmp_path, file_path)
+
+def read_json(file_path):
+    with open(file_path) as file_obj:
+        return json.load(file_obj)
+
+def publish_artifact_set(version, artifacts_dir='artifacts'):
+    '''
+    Copies the current model and preprocessing objects into a versioned directory that the serving layer can load
+    '''
+    try:
+        versions_dir = os.path.join(artifacts_dir, "versions")
+        version_dir = os.path.join(versions_dir, version)
+        os.makedirs(versions_dir, exist_ok= True)
+        
+        # stage the copy next to the target so that a republished version never keeps files of the previous one
+        staging_dir = tempfile.mkdtemp(prefix=f".{version}.", dir=versions_dir)
+        os.chmod(staging_dir, 0o755)
+        for file_name in os.listdir(artifacts_dir):
+            if file_name.endswith(".pkl"):
+                shutil.copy2(os.path.join(artifacts_dir, file_name), staging_dir)
+        
+        if os.path.isdir(version_dir):
+            retired_dir = tempfile.mkdtemp(prefix=f".{version}.retired.", dir=versions_dir)
+            os.replace(version_dir, os.path.join(retired_dir, version))
+            os.replace(staging_dir, version_dir)
+            shutil.rmtree(retired_dir)
+        else:
+            os.replace(staging_dir, version_dir)
+        
+        return version_dir
+    
+    except Exception as e:
+        raise CustomException(e, sys)
     
 # Custom transformer for creating interaction terms and additional features
 class FeatureEngineering(BaseEstimator, TransformerMixin):
-    def __init__(self):
-        pass
+    # input features each engineered feature is computed from
+    SOURCE_FEATURES = {
+        "rooms_per_household": ["total_rooms", "households"],
+        "bedrooms_per_rooms": ["total_bedrooms", "total_rooms"],
+        "bedrooms_per_households": ["total_bedrooms", "households"],
+        "population_per_household": ["population", "households"],
+    }
+
+    def __init__(self, dtype=None):
+        # dtype of the numerical features, e.g. np.float32 in compact mode
+        self.dtype = dtype
 
     def fit(self, X, y=None):
         return self
@@ -43,6 +96,11 @@ class FeatureEngineering(BaseEstimator, TransformerMixin):
     def transform(self, X):
         X = X.copy()
 
+        # objects pickled before the dtype parameter existed keep the incoming dtypes
+        if getattr(self, "dtype", None) is not None:
+            numerical_columns = X.select_dtypes(include="number").columns
+            X[numerical_columns] = X[numerical_columns].astype(self.dtype)
+
         # TODO: engineer other features with analysis
         # # Create interaction terms
         # X['longitude_latitude_interaction'] = X['longitude'] * X['latitude']
@@ -88,6 +146,164 @@ class LogTransformer(BaseEstimator, TransformerMixin):
                 X[colname] = np.log(X[colname])
         return X
 
+def relabel_imputed(imputed, columns):
+    '''
+    Labels the imputer output with the input column order, whether the imputer returns an array or a DataFrame
+    '''
+    if isinstance(imputed, pd.DataFrame):
+        return imputed.set_axis(columns, axis=1)
+    return pd.DataFrame(imputed, columns=columns)
+
+# Missing value imputation with fill values computed by the shared statistics transformation engine
+class StatsImputer(BaseEstimator, TransformerMixin):
+    def __init__(self, fill_values=None, source_columns=None):
+        self.fill_values = fill_values
+        # columns in the order the imputer outputs them, defaults to the input order
+        self.source_columns = source_columns
+
+    def fit(self, X, y=None):
+        self.feature_names_in_ = np.asarray(X.columns, dtype=object)
+        return self
+
+    def transform(self, X):
+        # like the column transformer imputer, the output is labelled with the input column order
+        return X[list(self.get_feature_names_out())].fillna(self.fill_values).set_axis(self.feature_names_in_, axis=1)
+
+    def get_feature_names_out(self, input_features=None):
+        # imputers pickled before source_columns existed keep the input order
+        source_columns = getattr(self, "source_columns", None)
+        columns = self.feature_names_in_ if source_columns is None else source_columns
+        return np.asarray(columns, dtype=object)
+
+# Standard / robust scaling and one-hot encoding with parameters computed by the shared statistics transformation
+# engine, writing every output column into one preallocated array
+class StatsPreprocessor(BaseEstimator, TransformerMixin):
+    def __init__(self, numerical_columns=None, prefixes=None, centers=None, scales=None,
+                 categories=None, category_centers=None, category_scales=None, dtype=np.float64):
+        self.numerical_columns = numerical_columns
+        self.prefixes = prefixes
+        self.centers = centers
+        self.scales = scales
+        self.categories = categories
+        self.category_centers = category_centers
+        self.category_scales = category_scales
+        self.dtype = dtype
+
+    def fit(self, X, y=None):
+        return self
+
+    def transform(self, X):
+        n_numerical = len(self.numerical_columns)
+        n_outputs = n_numerical + sum(len(categories) for categories in self.categories.values())
+        out = np.empty((len(X), n_outputs), dtype=self.dtype)
+
+        for i, column in enumerate(self.numerical_columns):
+            out[:, i] = X[column].to_numpy()
+        out[:, :n_numerical] -= self.centers
+        out[:, :n_numerical] /= self.scales
+
+        offset = n_numerical
+        out[:, offset:] = 0
+        for column, categories in self.categories.items():
+            # unknown categories are left as all zero indicators
+            codes = np.asarray(pd.Categorical(X[column], categories=categories).codes)
+            rows = np.nonzero(codes >= 0)[0]
+            out[rows, offset + codes[rows]] = 1
+            offset += len(categories)
+        out[:, n_numerical:] -= self.category_centers
+        out[:, n_numerical:] /= self.category_scales
+
+        return out
+
+    def get_feature_names_out(self, input_features=None):
+        names = [f"{prefix}__{column}" for prefix, column in zip(self.prefixes, self.numerical_columns)]
+        names += [
+            f"onehot__{column}_{category}" for column, categories in self.categories.items() for category in categories
+        ]
+        return np.asarray(names, dtype=object)
+
+# Single multi-quantile model predicting the lower and upper bounds of prediction intervals in one pass
+class QuantileIntervalModel(BaseEstimator):
+    def __init__(self, coverage=0.9, n_estimators=100, max_depth=5, learning_rate=0.1, random_state=None):
+        self.coverage = coverage
+        self.n_estimators = n_estimators
+        self.max_depth = max_depth
+        self.learning_rate = learning_rate
+        self.random_state = random_state
+
+    def fit(self, X, y):
+        alpha = 1 - self.coverage
+        self.estimator_ = XGBRegressor(
+            objective="reg:quantileerror", quantile_alpha=np.array([alpha / 2, 1 - alpha / 2]),
+            n_estimators=self.n_estimators, max_depth=self.max_depth,
+            learning_rate=self.learning_rate, random_state=self.random_state,
+        ).fit(X, y)
+        self.offset_ = 0.0
+        return self
+
+    def calibrate(self, X, y):
+        '''
+        Widens (or narrows) both bounds by the conformal score quantile on held-out data so that the
+        intervals reach the requested coverage
+        '''
+        bounds = self._predict_bounds(X)
+        scores = np.maximum(bounds[:, 0] - y, y - bounds[:, 1])
+        level = min(1.0, self.coverage * (1 + 1 / len(scores)))
+        self.offset_ = float(np.quantile(scores, level))
+        return self
+
+    def _predict_bounds(self, X):
+        # the quantiles are fitted independently and can cross, so the lower bound is the smaller one
+        return np.sort(self.estimator_.predict(X), axis=1)
+
+    def predict_interval(self, X, predictions=None):
+        '''
+        Returns an (n, 2) array of lower and upper bounds, widened to contain the point predictions if given
+        '''
+        bounds = self._predict_bounds(X)
+        lower = bounds[:, 0] - self.offset_
+        upper = bounds[:, 1] + self.offset_
+        if predictions is not None:
+            lower = np.minimum(lower, predictions)
+            upper = np.maximum(upper, predictions)
+        return np.column_stack([lower, upper])
+
+    def coverage_score(self, X, y):
+        intervals = self.predict_interval(X)
+        return float(np.mean((intervals[:, 0] <= y) & (y <= intervals[:, 1])))
+
+def split_features_target(data):
+    '''
+    Returns the features and target of a transformed data set given either as a (features, target) pair
+    or as a single array with the target in the last column
+    '''
+    if isinstance(data, tuple):
+        return data
+    return data[:, :-1], data[:, -1]
+
+def evaluate_model(model, para, X_train, y_train, X_test, y_test, n_jobs=-1):
+    '''
+    Tunes the model with a 3-fold grid search, refits it with the best parameters and returns its scores
+    '''
+    gs = GridSearchCV(model, para, cv=3, n_jobs = n_jobs)
+    gs.fit(X_train,y_train)
+
+    model.set_params(**gs.best_params_)
+    model.fit(X_train,y_train)
+
+    y_train_pred = model.predict(X_train)
+
+    y_test_pred = model.predict(X_test)
+
+    logging.info(f"Best {model} model evaluated with best parameters {gs.best_params_} getting training score of {gs.best_score_}")
+
+    return {
+        "best_params": gs.best_params_,
+        "cv_score": gs.best_score_,
+        "train_score": r2_score(y_train, y_train_pred),
+        "test_score": r2_score(y_test, y_test_pred),
+    }
+
 def evaluate_models(X_train, y_train,X_test,y_test,models, param):
     '''
     
@@ -99,25 +315,11 @@ def evaluate_models(X_train, y_train,X_test,y_test,models, param):
             model = list(models.values())[i]
             para=param[list(models.keys())[i]]
 
-            gs = GridSearchCV(model, para, cv=3, n_jobs = -1)
-            gs.fit(X_train,y_train)
-
-            model.set_params(**gs.best_params_)
-            model.fit(X_train,y_train)
-
-            y_train_pred = model.predict(X_train)
-
-            y_test_pred = model.predict(X_test)
+            scores = evaluate_model(model, para, X_train, y_train, X_test, y_test)
 
-            train_model_score = r2_score(y_train, y_train_pred)
-            
-            logging.info(f"Best {model} model evaluated with best parameters {gs.best_params_} getting training score of {gs.best_score_}")
-
-            # test_model_score = r2_score(y_test, y_test_pred)
-
-            report[list(models.keys())[i]] = train_model_score
+            report[list(models.keys())[i]] = scores["train_score"]
 
         return report
 
     except Exception as e:
-        raise CustomException(e, sys)
\ No newline at end of file
+        raise CustomException(e, sys)